@@ -6,8 +6,8 @@ Jordan McConnell @ SparkFun Electronics
 https://github.com/sparkfun/ADXL337_Breakout
 
 This example collects raw accelerometer data from the ADXL337 sensor using
-analog reads and then converts it into common units (g's) and prints the
-result to the Serial Monitor.
+analog reads at 500 Hz and streams the raw counts over serial, one "x,y,z"
+line per sample.
 
 Developed/Tested with:
 Arduino Uno
@@ -17,58 +17,34 @@ This code is beerware.
 Distributed as-is; no warranty is given. 
 ******************************************************************************/
 
-// Make sure these two variables are correct for your setup
-int scale = 3; // 3 (±3g) for ADXL337, 200 (±200g) for ADXL377
-boolean micro_is_5V = true; // Set to true if using a 5V microcontroller such as the Arduino Uno, false if using a 3.3V microcontroller, this affects the interpretation of the sensor data
+// Make sure this is correct for your setup. The sketch only sends raw counts; scaling
+// to g, and the 5V/3.3V reference, are handled on the receiving side (adxl337.py).
+const unsigned long sample_period = 2000; // Microseconds between reads (500 Hz, the sensor's bandwidth)
+
+unsigned long next_sample;
 
 void setup()
 {
-  // Initialize serial communication at 115200 baud
+  // Initialize serial communication at 115200 baud. A line is at most 16 bytes, so
+  // 500 lines a second fit in the ~11.5 kB/s the port can carry.
   Serial.begin(115200);
+  next_sample = micros();
 }
 
-// Read, scale, and print accelerometer data
+// Read and send accelerometer data as "x,y,z" lines of raw ADC counts
 void loop()
 {
+  // Wait for the next sample time, keeping to the schedule rather than drifting
+  while ((long)(micros() - next_sample) < 0)
+    ;
+  next_sample += sample_period;
+
   // Get raw accelerometer data for each axis
   int rawX = analogRead(A0);
   int rawY = analogRead(A1);
   int rawZ = analogRead(A2);
-  
-  // Scale accelerometer ADC readings into common units
-  // Scale map depends on if using a 5V or 3.3V microcontroller
-  float scaledX, scaledY, scaledZ; // Scaled values for each axis
-  if (micro_is_5V) // Microcontroller runs off 5V
-  {
-    scaledX = mapf(rawX, 0, 675, -scale, scale); // 3.3/5 * 1023 =~ 675
-    scaledY = mapf(rawY, 0, 675, -scale, scale);
-    scaledZ = mapf(rawZ, 0, 675, -scale, scale);
-  }
-  else // Microcontroller runs off 3.3V
-  {
-    scaledX = mapf(rawX, 0, 1023, -scale, scale);
-    scaledY = mapf(rawY, 0, 1023, -scale, scale);
-    scaledZ = mapf(rawZ, 0, 1023, -scale, scale);
-  }
-  
-  // Print out raw X,Y,Z accelerometer readings
-  Serial.print("X: "); Serial.println(rawX);
-  Serial.print("Y: "); Serial.println(rawY);
-  Serial.print("Z: "); Serial.println(rawZ);
-  Serial.println();
-  
-  // Print out scaled X,Y,Z accelerometer readings
-  Serial.print("X: "); Serial.print(scaledX); Serial.println(" g");
-  Serial.print("Y: "); Serial.print(scaledY); Serial.println(" g");
-  Serial.print("Z: "); Serial.print(scaledZ); Serial.println(" g");
-  Serial.println();
-  
-  delay(2000); // Minimum delay of 2 milliseconds between sensor reads (500 Hz)
-}
 
-// Same functionality as Arduino's standard map function, except using floats
-float mapf(float x, float in_min, float in_max, float out_min, float out_max)
-{
-  return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min;
+  Serial.print(rawX); Serial.print(',');
+  Serial.print(rawY); Serial.print(',');
+  Serial.println(rawZ);
 }
-
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import time
+import numpy as np
+
+# Full scale range in g: 3 for the ADXL337, 200 for the ADXL377.
+full_scale = 3
+
+# Largest reading of the 10 bit ADC on the microcontroller.
+adc_max = 1023
+
+# The sensor runs off 3.3V, so its output only spans the whole ADC range when the ADC
+# reference is 3.3V too. On a 5V board it tops out at 3.3/5 of the range (~675 counts).
+sensor_supply = 3.3
+
+# Samples per second streamed by ADXL337_example (the sensor's 500 Hz bandwidth), and the
+# baud rate it streams them at.
+sample_rate = 500
+baud_rate = 115200
+
+# One streamed sample: three ADC readings of at most four digits, so they always fit in
+# an int16, with the carriage return of a Windows style line ending if there is one.
+count_line = re.compile(rb"\d{1,4},\d{1,4},\d{1,4}\r?")
+
+# Orientation names for the six positions of a calibration, indexed by axis and sign.
+position_names = {(0, 1): "+x up", (0, -1): "-x up", (1, 1): "+y up",
+                  (1, -1): "-y up", (2, 1): "+z up", (2, -1): "-z up"}
+
+# Conversion from raw ADC counts to g for all three axes in one step:
+#
+#   g = counts @ gain + bias
+#
+# counts is an n x 3 array of raw X/Y/Z readings. gain is a 3 x 3 matrix holding each
+# axis' sensitivity on its diagonal and the cross-axis terms off it, and bias is the
+# per-axis offset, so a block of any size is converted with one matrix multiply.
+class Calibration:
+    def __init__(self, gain, bias):
+        self.gain = np.asarray(gain, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+
+    # Calibration from the data sheet alone: counts map linearly onto -full_scale ..
+    # full_scale over the sensor's output range, like the example sketch's mapf. reference
+    # is the ADC reference voltage of the microcontroller (5.0 or 3.3).
+    @classmethod
+    def nominal(cls, reference=5.0, scale=full_scale):
+        full_counts = adc_max * min(1.0, sensor_supply / reference)
+        counts_per_g = full_counts / (2 * scale)
+        return cls(np.eye(3) / counts_per_g, np.full(3, -scale))
+
+    @classmethod
+    def load(cls, file_name):
+        data = np.load(file_name)
+        return cls(data["gain"], data["bias"])
+
+    def save(self, file_name):
+        np.savez(file_name, gain=self.gain, bias=self.bias)
+
+    # Convert an n x 3 array of raw counts to g. out, if given, is an n x 3 float32 array
+    # to write the result to instead of allocating a new one.
+    def convert(self, counts, out=None):
+        out = np.matmul(counts, self.gain, out=out)
+        out += self.bias
+        return out
+
+# Fit a Calibration from six static captures, one with each axis pointing straight up
+# and straight down. Each capture is an n x 3 array of raw counts taken with the sensor
+# held still; which orientation it is is worked out from reference (the nominal
+# calibration by default). Every capture is averaged down to one reading, then the 12
+# gain and bias terms are found by least squares so each reading converts as close as
+# possible to exactly 1 g along its axis. Returns the calibration and, for each capture,
+# its orientation and the size of the error left after calibration in g.
+def calibrate(captures, reference=None):
+    reference = reference or Calibration.nominal()
+    means = np.array([np.mean(capture, axis=0) for capture in captures], dtype=np.float64)
+    nominal = reference.convert(means.astype(np.float32))
+
+    # Expected reading of each capture: 1 g on whichever axis is closest to vertical.
+    axes = np.argmax(np.abs(nominal), axis=1)
+    signs = np.sign(nominal[np.arange(len(means)), axes]).astype(int)
+    positions = [(int(axis), int(sign)) for axis, sign in zip(axes, signs)]
+    missing = [position_names[p] for p in position_names if p not in positions]
+    if missing:
+        raise ValueError("captures don't cover every orientation, missing " + ", ".join(missing))
+    expected = np.zeros_like(means)
+    expected[np.arange(len(means)), axes] = signs
+
+    design = np.hstack((means, np.ones((len(means), 1))))
+    solution, _, _, _ = np.linalg.lstsq(design, expected, rcond=None)
+    calibration = Calibration(solution[:3], solution[3])
+
+    errors = np.linalg.norm(calibration.convert(means.astype(np.float32)) - expected, axis=1)
+    return calibration, [(position_names[p], float(e)) for p, e in zip(positions, errors)]
+
+# Incremental parser for the "x,y,z" lines ADXL337_example streams. Bytes go in as they
+# arrive, in pieces of any size, and come out as n x 3 arrays of complete samples. Lines
+# cut off at the start of a capture or damaged on the wire are skipped.
+class CountParser:
+    def __init__(self):
+        self.partial = b""
+        self.skipped = 0
+
+    def feed(self, data):
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        good = [line.rstrip(b"\r") for line in lines if count_line.fullmatch(line)]
+        self.skipped += len(lines) - len(good)
+        if not good:
+            return np.empty((0, 3), dtype=np.int16)
+        return np.array(b",".join(good).split(b","), dtype=np.int16).reshape(-1, 3)
+
+# Reads ADXL337_example's stream from an open serial port without blocking, for a logger
+# that polls the sensor on its own schedule. Each read() takes whatever has arrived and
+# returns the newest complete sample converted to g, or None if none has come in since
+# the last read.
+class CountReader:
+    def __init__(self, ser, calibration):
+        self.ser = ser
+        self.calibration = calibration
+        self.counts = CountParser()
+
+    # Corrupted lines skipped so far.
+    @property
+    def skipped(self):
+        return self.counts.skipped
+
+    def read(self):
+        block = self.counts.feed(self.ser.read(self.ser.in_waiting))
+        if not len(block):
+            return None
+        return self.calibration.convert(block[-1:])[0]
+
+# Helper function for reading a capture of "x,y,z" lines from a file as an n x 3 array.
+def load_counts(file_name):
+    with open(file_name, "rb") as capture:
+        return CountParser().feed(capture.read() + b"\n")
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Convert or calibrate ADXL337 readings streamed by ADXL337_example.")
+    parser.add_argument("source", nargs="*", help="serial port to read from, or capture files of x,y,z lines")
+    parser.add_argument("--reference", type=float, default=5.0, choices=[5.0, 3.3],
+                        help="ADC reference voltage of the microcontroller")
+    parser.add_argument("--calibration", help="calibration file to use, or to write with --calibrate")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="fit a calibration from six static captures given as sources")
+    parser.add_argument("--log", help="log converted samples to this file in the lsm9ds0 log format")
+    parser.add_argument("--baud", type=int, default=baud_rate)
+    args = parser.parse_args()
+
+    nominal = Calibration.nominal(args.reference)
+    calibration = Calibration.load(args.calibration) if args.calibration and not args.calibrate else nominal
+    live = len(args.source) == 1 and args.source[0].startswith(("/dev/", "COM"))
+
+    if args.calibrate:
+        calibration, errors = calibrate([load_counts(name) for name in args.source], nominal)
+        for name, (position, error) in zip(args.source, errors):
+            print("%s: %s, off by %.4f g" % (name, position, error))
+        print("gain:\n%s\nbias: %s" % (calibration.gain, calibration.bias))
+        calibration.save(args.calibration or "adxl337_calibration.npz")
+    elif not live:
+        # Convert captures that are already on disk.
+        for name in args.source:
+            g = calibration.convert(load_counts(name))
+            print("%s: %d samples, mean %s g, std %s g" % (name, len(g), g.mean(axis=0), g.std(axis=0)))
+    else:
+        import serial
+        from lsm9ds0 import ACCEL, SampleLog
+
+        # Read whatever has arrived, convert it as one block, and log it. The sketch doesn't
+        # send times, so samples are spaced at the sample rate back from when they were read.
+        ser = serial.Serial(args.source[0], args.baud, timeout=0.1)
+        counts = CountParser()
+        log = SampleLog(args.log) if args.log else None
+        start = last_report = time.monotonic()
+        samples = 0
+        try:
+            while True:
+                block = counts.feed(ser.read(max(1, ser.in_waiting)))
+                if not len(block):
+                    continue
+                now = time.monotonic()
+                g = calibration.convert(block)
+                samples += len(g)
+                if log is not None:
+                    log.extend(now - np.arange(len(g) - 1, -1, -1) / sample_rate, ACCEL, g)
+                if now - last_report > 1.0:
+                    print("%.1f Hz  x %6.3f g  y %6.3f g  z %6.3f g  (%d bad lines)" % (
+                        samples / (now - start), g[-1, 0], g[-1, 1], g[-1, 2], counts.skipped))
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        if log is not None:
+            log.close()
+            print(log.report())
@@ -22,10 +22,262 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from __future__ import print_function
-import time, sys, signal, atexit
-from upm import pyupm_lsm9ds0 as sensorObj
+import argparse, time, sys, signal, atexit
+import numpy as np
+
+# I2C addresses of the gyro and the accelerometer/magnetometer (XM) halves of the chip.
+gyro_address = 0x6B
+xm_address = 0x1D
+
+# Gyro registers
+CTRL_REG1_G = 0x20      # Output data rate, bandwidth, power and axis enables
+CTRL_REG4_G = 0x23      # Full scale
+CTRL_REG5_G = 0x24      # FIFO enable
+STATUS_REG_G = 0x27     # Data ready, followed by OUT_X_L_G .. OUT_Z_H_G
+FIFO_CTRL_REG_G = 0x2E  # FIFO mode
+FIFO_SRC_REG_G = 0x2F   # FIFO level
+
+# Accelerometer/magnetometer registers
+STATUS_REG_M = 0x07     # Mag data ready, followed by OUT_X_L_M .. OUT_Z_H_M
+CTRL_REG0_XM = 0x1F     # FIFO enable
+CTRL_REG1_XM = 0x20     # Accel output data rate and axis enables
+CTRL_REG2_XM = 0x21     # Accel full scale
+CTRL_REG5_XM = 0x24     # Mag resolution and output data rate
+CTRL_REG6_XM = 0x25     # Mag full scale
+CTRL_REG7_XM = 0x26     # Mag mode
+STATUS_REG_A = 0x27     # Accel data ready, followed by OUT_X_L_A .. OUT_Z_H_A
+FIFO_CTRL_REG = 0x2E    # Accel FIFO mode
+FIFO_SRC_REG = 0x2F     # Accel FIFO level
+
+# First data register of both the gyro and the accelerometer. With the FIFO on, reading
+# past OUT_Z_H wraps back around to it, so one block read can take several samples.
+OUT_X_L = 0x28
+
+# Setting the top bit of a register address reads several registers in one transaction.
+AUTO_INCREMENT = 0x80
+
+# STATUS_REG ZYXDA bit, new data on all three axes.
+DATA_READY = 0x08
+
+# FIFO_CTRL stream mode: the FIFO keeps the newest 32 samples.
+FIFO_STREAM = 0x40
+fifo_depth = 32
+
+# Largest SMBus block read is 32 bytes, so FIFOs are drained 5 samples (30 bytes) at a time.
+samples_per_read = 5
+
+# Output data rates in Hz and the control register value that selects them, with all axes on.
+accel_rates = {100: 0x67, 200: 0x77, 400: 0x87, 800: 0x97, 1600: 0xA7}
+gyro_rates = {95: 0x0F, 190: 0x4F, 380: 0x8F, 760: 0xCF}
+mag_rates = {25: 0x0C, 50: 0x10, 100: 0x14}
+
+# Full scale control register values. A boost pulls several g and the airframe can spin
+# fast, so the accel runs at +-16 g and the gyro at +-2000 dps; the mag stays at +-2 gauss.
+ACCEL_FS_16G = 0x20
+GYRO_FS_2000DPS = 0x20
+
+# Sensitivities at those full scales.
+accel_scale = 0.732e-3  # g/LSB
+gyro_scale = 70e-3      # dps/LSB
+mag_scale = 0.08e-3     # gauss/LSB
+
+# Kinds of sample in a log.
+ACCEL, GYRO, MAG = 0, 1, 2
+kind_names = ["accel", "gyro", "mag"]
+
+# One logged sample: monotonic time in seconds, which sensor it is from, and its three axes.
+record_dtype = np.dtype([("time", "<f8"), ("kind", "u1"), ("x", "<f4"), ("y", "<f4"), ("z", "<f4")])
+
+# Samples buffered in memory before they are written out as one block.
+block_size = 8192
+
+# Bins for the histogram of intervals between samples, 10 us wide up to 50 ms. Longer
+# intervals land in the last bin.
+interval_bins = np.linspace(0, 0.05, 5001)
+
+# Helper function for turning little endian 16 bit axis readings into an n x 3 array.
+def to_axes(data, scale):
+    return np.frombuffer(bytes(data), dtype="<i2").reshape(-1, 3) * scale
+
+# Register level driver for the LSM9DS0 on an SMBus-style bus (write_byte_data,
+# read_byte_data, read_i2c_block_data). Each read is a single block read of the status
+# register and the six data bytes after it, so new data can be told from old without a
+# second transaction. With fifo set, the accel and gyro FIFOs run in stream mode and
+# are drained in bursts, so samples aren't lost when the logger is busy for a moment.
+class LSM9DS0:
+    def __init__(self, bus, accel_rate=1600, gyro_rate=760, mag_rate=100, fifo=False):
+        self.bus = bus
+        self.accel_rate = accel_rate
+        self.gyro_rate = gyro_rate
+        self.mag_rate = mag_rate
+        self.fifo = fifo
+
+        self.bus.write_byte_data(gyro_address, CTRL_REG1_G, gyro_rates[gyro_rate])
+        self.bus.write_byte_data(gyro_address, CTRL_REG4_G, GYRO_FS_2000DPS)
+        self.bus.write_byte_data(xm_address, CTRL_REG1_XM, accel_rates[accel_rate])
+        self.bus.write_byte_data(xm_address, CTRL_REG2_XM, ACCEL_FS_16G)
+        self.bus.write_byte_data(xm_address, CTRL_REG5_XM, 0x60 | mag_rates[mag_rate])
+        self.bus.write_byte_data(xm_address, CTRL_REG6_XM, 0x00)
+        self.bus.write_byte_data(xm_address, CTRL_REG7_XM, 0x00)
+
+        # Stream mode keeps the newest samples if the FIFO is not drained in time.
+        self.bus.write_byte_data(gyro_address, CTRL_REG5_G, 0x40 if fifo else 0x00)
+        self.bus.write_byte_data(gyro_address, FIFO_CTRL_REG_G, FIFO_STREAM if fifo else 0x00)
+        self.bus.write_byte_data(xm_address, CTRL_REG0_XM, 0x40 if fifo else 0x00)
+        self.bus.write_byte_data(xm_address, FIFO_CTRL_REG, FIFO_STREAM if fifo else 0x00)
+
+    # Read one sample from the status register at register on address, returning its three
+    # axes scaled by scale, or None if nothing new has arrived.
+    def read(self, address, register, scale):
+        data = self.bus.read_i2c_block_data(address, register | AUTO_INCREMENT, 7)
+        if not data[0] & DATA_READY:
+            return None
+        return to_axes(data[1:], scale)[0]
+
+    def read_accel(self):
+        return self.read(xm_address, STATUS_REG_A, accel_scale)
+
+    def read_gyro(self):
+        return self.read(gyro_address, STATUS_REG_G, gyro_scale)
+
+    def read_mag(self):
+        return self.read(xm_address, STATUS_REG_M, mag_scale)
+
+    # Read every sample waiting in the FIFO at address as an n x 3 array, oldest first.
+    def drain(self, address, fifo_src, scale):
+        count = self.bus.read_byte_data(address, fifo_src) & 0x1F
+        data = []
+        while count > 0:
+            n = min(count, samples_per_read)
+            data += self.bus.read_i2c_block_data(address, OUT_X_L | AUTO_INCREMENT, n * 6)
+            count -= n
+        return to_axes(data, scale)
+
+    def drain_accel(self):
+        return self.drain(xm_address, FIFO_SRC_REG, accel_scale)
+
+    def drain_gyro(self):
+        return self.drain(gyro_address, FIFO_SRC_REG_G, gyro_scale)
+
+# Preallocated in-memory log of samples, written to disk in large binary blocks of
+# record_dtype. Achieved rate and timing jitter are tracked per kind of sample as each
+# block is written, so the sampling loop itself does nothing but fill in a row, and the
+# statistics take the same memory however long the log runs.
+class SampleLog:
+    def __init__(self, file_name, block_size=block_size):
+        self.file = open(file_name, "wb")
+        self.block = np.zeros(block_size, dtype=record_dtype)
+        self.count = 0
+        self.samples = [0] * len(kind_names)
+        self.first = [None] * len(kind_names)
+        self.last = [None] * len(kind_names)
+        self.interval_sum = [0.0] * len(kind_names)
+        self.interval_sum_sq = [0.0] * len(kind_names)
+        self.interval_max = [0.0] * len(kind_names)
+        self.histograms = [np.zeros(len(interval_bins) - 1, dtype=np.int64) for _ in kind_names]
+
+    def append(self, timestamp, kind, x, y, z):
+        self.block[self.count] = (timestamp, kind, x, y, z)
+        self.count += 1
+        if self.count == len(self.block):
+            self.flush()
+
+    # Append an n x 3 array of samples of one kind with their times.
+    def extend(self, times, kind, axes):
+        n = len(times)
+        if self.count + n > len(self.block):
+            self.flush()
+        rows = self.block[self.count:self.count + n]
+        rows["time"] = times
+        rows["kind"] = kind
+        rows["x"], rows["y"], rows["z"] = axes[:, 0], axes[:, 1], axes[:, 2]
+        self.count += n
+        if self.count == len(self.block):
+            self.flush()
+
+    def flush(self):
+        block = self.block[:self.count]
+        block.tofile(self.file)
+        self.file.flush()
+
+        # Add up the intervals between samples of each kind, bridging from the last block.
+        for kind in range(len(kind_names)):
+            times = block["time"][block["kind"] == kind]
+            if len(times) == 0:
+                continue
+            self.samples[kind] += len(times)
+            if self.first[kind] is None:
+                self.first[kind] = times[0]
+            else:
+                times = np.concatenate(([self.last[kind]], times))
+            self.last[kind] = times[-1]
+
+            intervals = np.diff(times)
+            if len(intervals) == 0:
+                continue
+            self.interval_sum[kind] += intervals.sum()
+            self.interval_sum_sq[kind] += np.square(intervals).sum()
+            self.interval_max[kind] = max(self.interval_max[kind], intervals.max())
+            self.histograms[kind] += np.histogram(np.minimum(intervals, interval_bins[-1]), interval_bins)[0]
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    # Rate and jitter of each kind of sample logged so far.
+    def report(self):
+        lines = []
+        for kind, name in enumerate(kind_names):
+            n = self.samples[kind] - 1
+            if n < 1:
+                continue
+            mean = self.interval_sum[kind] / n
+            jitter = np.sqrt(max(self.interval_sum_sq[kind] / n - mean ** 2, 0))
+            p99 = interval_bins[np.searchsorted(np.cumsum(self.histograms[kind]), 0.99 * n) + 1]
+            lines.append("%-5s %8d samples  %7.1f Hz  interval %.3f ms  jitter %.3f ms  p99 %.2f ms  max %.3f ms" % (
+                name, self.samples[kind], n / (self.last[kind] - self.first[kind]),
+                mean * 1000, jitter * 1000, p99 * 1000, self.interval_max[kind] * 1000))
+        return "\n".join(lines)
+
+# Helper function for loading a log written by SampleLog.
+def load(file_name):
+    return np.fromfile(file_name, dtype=record_dtype)
+
+# Sample the IMU as fast as the bus allows for duration seconds (or until interrupted),
+# stamping each sample with time.monotonic(). The magnetometer is read every mag_every
+# passes since it runs at a fraction of the accel and gyro rates. In FIFO mode each pass
+# drains both FIFOs and the samples are timed back from the read by the data rate.
+def log_imu(imu, log, duration=None, mag_every=8):
+    start = time.monotonic()
+    passes = 0
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            if imu.fifo:
+                for kind, axes, rate in ((ACCEL, imu.drain_accel(), imu.accel_rate),
+                                         (GYRO, imu.drain_gyro(), imu.gyro_rate)):
+                    if len(axes):
+                        now = time.monotonic()
+                        log.extend(now - np.arange(len(axes) - 1, -1, -1) / rate, kind, axes)
+            else:
+                for kind, read in ((ACCEL, imu.read_accel), (GYRO, imu.read_gyro)):
+                    axes = read()
+                    if axes is not None:
+                        log.append(time.monotonic(), kind, *axes)
+
+            if passes % mag_every == 0:
+                axes = imu.read_mag()
+                if axes is not None:
+                    log.append(time.monotonic(), MAG, *axes)
+            passes += 1
+    except KeyboardInterrupt:
+        pass
+    log.close()
+    return log.report()
 
 def main():
+    from upm import pyupm_lsm9ds0 as sensorObj
+
     # Instantiate an LSM9DS0 using default parameters (bus 1, gyro addr 6b,
     # xm addr 1d)
     sensor = sensorObj.LSM9DS0()
@@ -73,4 +325,18 @@ def main():
         time.sleep(.5)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Print LSM9DS0 readings, or log them at full rate.")
+    parser.add_argument("--log", metavar="FILE", help="log samples to FILE instead of printing them")
+    parser.add_argument("--duration", type=float, help="seconds to log for (default: until Ctrl-C)")
+    parser.add_argument("--fifo", action="store_true", help="read accel and gyro through their FIFOs")
+    parser.add_argument("--accel-rate", type=int, default=1600, choices=sorted(accel_rates))
+    parser.add_argument("--gyro-rate", type=int, default=760, choices=sorted(gyro_rates))
+    args = parser.parse_args()
+
+    if args.log is None:
+        main()
+    else:
+        import smbus
+        imu = LSM9DS0(smbus.SMBus(1), args.accel_rate, args.gyro_rate, fifo=args.fifo)
+        print(log_imu(imu, SampleLog(args.log), args.duration))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import random
+import time
+import numpy as np
+import simulation
+from event_detector import EventDetector
+from SensorDrivers import MPL3115A2 as mpl
+from SensorDrivers.MPL3115A2 import MPL3115A2
+from SensorDrivers.lsm9ds0 import LSM9DS0
+
+# Flights to run the detector on: name and arguments to FlightProfile.synthetic.
+profiles = [
+    ("default", {}),
+    ("short hard burn", {"boost_accel": 150.0, "burn_time": 1.0}),
+    ("long soft burn", {"boost_accel": 40.0, "burn_time": 4.0, "drag": 0.0001}),
+    ("high drag", {"drag": 0.0006}),
+]
+
+# Rates (Hz) the IMU and barometer are polled at, the data_logger defaults.
+imu_rate = 200
+baro_rate = 25
+
+# Seconds on the pad before launch and after landing.
+pad_time = 5.0
+
+# Seconds per byte on a 400 kHz I2C bus.
+bus_byte_time = 22.5e-6
+
+# Fly a profile on the simulated bus, reading the sensors through their drivers the way
+# data_logger does and feeding the detector what they return: the LSM9DS0's z axis,
+# scaled and saturated at its full scale, and the MPL3115A2's altitude. The flight runs
+# speed times faster than real time, bus timing included, and every time is in flight
+# seconds. Returns the detector and the processing time of every sample in seconds.
+def run_flight(profile, speed):
+    bus, clock = simulation.simulated_bus(profile, pad_time=pad_time / speed, speed=speed,
+                                              per_byte=bus_byte_time / speed)
+    imu = LSM9DS0(bus)
+    baro = MPL3115A2(bus, osr=8)
+    detector = EventDetector()
+    costs = []
+    clock_time = clock.flight_time
+    next_imu = next_baro = -pad_time
+    measuring = False
+    end = profile.duration + pad_time
+    while True:
+        t = clock_time()
+        if t > end:
+            break
+
+        # Poll the accelerometer on its own schedule, skipping slots that have gone by.
+        if t >= next_imu:
+            accel = imu.read_accel()
+            if accel is not None:
+                t = clock_time()
+                start = time.perf_counter()
+                detector.accel(t, accel[2])
+                costs.append(time.perf_counter() - start)
+            next_imu = max(next_imu + 1 / imu_rate, t)
+
+        # Start a barometer measurement on schedule and take it once it is ready.
+        if not measuring and t >= next_baro:
+            baro.trigger()
+            measuring = True
+            next_baro = max(next_baro + 1 / baro_rate, t)
+        elif measuring and bus.read_byte_data(baro.address, mpl.STATUS) & mpl.STATUS_PTDR:
+            altitude = baro.read().altitude
+            t = clock_time()
+            start = time.perf_counter()
+            detector.baro(t, altitude)
+            costs.append(time.perf_counter() - start)
+            measuring = False
+    return detector, np.array(costs)
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Benchmark flight event detection on simulated flights.")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the sensor noise")
+    parser.add_argument("--speed", type=float, default=10.0, help="times faster than real time to fly each flight")
+    parser.add_argument("--output", default="bench_events.json", help="file to write machine-readable results to")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = []
+    for name, settings in profiles:
+        profile = simulation.FlightProfile.synthetic(**settings)
+        burn_time = settings.get("burn_time", 2.5)
+        truth = {"liftoff": 0.0, "burnout": burn_time, "apogee": profile.apogee_time, "landing": profile.duration}
+
+        detector, costs = run_flight(profile, args.speed)
+
+        # Latency is from when the event really happened to the sample it was detected on.
+        events = {}
+        for event in detector.events:
+            events[event.name] = {"true_s": truth[event.name], "estimated_s": event.time,
+                                  "detected_s": event.detected,
+                                  "latency_ms": (event.detected - truth[event.name]) * 1000,
+                                  "estimate_error_ms": (event.time - truth[event.name]) * 1000}
+        result = {
+            "name": name,
+            "apogee_m": profile.apogee,
+            "samples": len(costs),
+            "mean_us": costs.mean() * 1e6,
+            "p99_us": np.percentile(costs, 99) * 1e6,
+            "max_us": costs.max() * 1e6,
+            "max_samples_per_s": 1 / costs.mean(),
+            "events": events,
+            "missed": [name for name in truth if name not in events],
+        }
+        results.append(result)
+
+        print("%s: apogee %.0f m, %d samples, %.2f us/sample (p99 %.2f us), up to %.0f samples/s" % (
+            name, profile.apogee, len(costs), result["mean_us"], result["p99_us"], result["max_samples_per_s"]))
+        for event_name, event in events.items():
+            print("  %-8s at %7.3f s, detected %7.3f s: latency %7.1f ms, estimate off by %6.1f ms" % (
+                event_name, event["true_s"], event["detected_s"], event["latency_ms"], event["estimate_error_ms"]))
+        for event_name in result["missed"]:
+            print("  %-8s not detected" % event_name)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print("Results written to " + args.output)
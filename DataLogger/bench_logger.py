@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import data_logger
+import simulation
+from SensorDrivers.MPL3115A2 import MPL3115A2
+from SensorDrivers.lsm9ds0 import LSM9DS0
+
+# Scenarios to run: name, IMU rate, barometer rate, ring capacity, and bus faults.
+scenarios = [
+    ("pad rates", 200, 25, data_logger.ring_capacity, {}),
+    ("full rate", 760, 29, data_logger.ring_capacity, {}),
+    ("slow bus 0.5 ms", 760, 29, data_logger.ring_capacity, {"latency": 0.0005}),
+    ("1% bus errors", 760, 29, data_logger.ring_capacity, {"error_rate": 0.01}),
+    ("0.5% 20 ms stalls", 760, 29, data_logger.ring_capacity, {"stall_rate": 0.005, "stall_time": 0.02}),
+    ("small ring", 760, 29, 256, {}),
+]
+
+# Run the logger on a simulated bus for duration seconds and collect its statistics.
+def run_scenario(imu_rate, baro_rate, capacity, faults, duration, speed):
+    bus, clock = simulation.simulated_bus(pad_time=0, speed=speed, **faults)
+    imu = LSM9DS0(bus)
+    baro = MPL3115A2(bus, osr=8)
+
+    def read_imu():
+        accel, gyro = imu.read_accel(), imu.read_gyro()
+        if accel is None or gyro is None:
+            return None
+        return np.concatenate((accel, gyro))
+
+    def read_baro():
+        sample = baro.sample()
+        return sample.altitude, sample.pressure, sample.temperature
+
+    tasks = [data_logger.SensorTask("imu", imu_rate, read_imu),
+             data_logger.SensorTask("baro", baro_rate, read_baro)]
+    ring = data_logger.SampleRing(capacity)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "log.bin")
+        start = time.perf_counter()
+        data_logger.run_logger(tasks, file_name, duration, ring)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(file_name)
+
+    rows = size // data_logger.row_dtype.itemsize
+    return {
+        "sensors": {task.name: {"target_hz": task.rate, "achieved_hz": task.samples / elapsed,
+                                "missed": task.missed, "errors": task.errors,
+                                "max_late_ms": task.max_late * 1000} for task in tasks},
+        "rows": rows,
+        "rows_lost": ring.written - rows,
+        "disk_bytes_per_s": size / elapsed,
+        "bus_transactions_per_s": bus.transactions / elapsed,
+    }
+
+# Rows per second the ring buffer and writer can move with no sensors in the way.
+def ring_throughput(rows=200000):
+    ring = data_logger.SampleRing()
+    values = (1.0, 2.0, 3.0, 4.0, 5.0, 6.0)
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        seq = 0
+        for i in range(rows):
+            ring.append(0, 0.0, float(i), values)
+            if i % 4096 == 4095:
+                block, seq, _ = ring.since(seq)
+                block.tofile(output)
+        block, seq, _ = ring.since(seq)
+        block.tofile(output)
+        elapsed = time.perf_counter() - start
+    return rows / elapsed
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Benchmark the DataLogger on simulated sensors.")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds to run each scenario for")
+    parser.add_argument("--speed", type=float, default=1.0, help="how much faster than real time the flight runs")
+    parser.add_argument("--output", default="bench_logger.json", help="file to write machine-readable results to")
+    args = parser.parse_args()
+
+    results = {"ring_rows_per_s": ring_throughput(), "scenarios": []}
+    print("Ring buffer and writer: %.0f rows/s" % results["ring_rows_per_s"])
+    for name, imu_rate, baro_rate, capacity, faults in scenarios:
+        result = run_scenario(imu_rate, baro_rate, capacity, faults, args.duration, args.speed)
+        result["name"] = name
+        results["scenarios"].append(result)
+        print("%s: %d rows (%d lost), %.1f kB/s to disk, %.0f bus transactions/s" % (
+            name, result["rows"], result["rows_lost"], result["disk_bytes_per_s"] / 1000,
+            result["bus_transactions_per_s"]))
+        for sensor, stats in result["sensors"].items():
+            print("  %-5s %6.1f / %6.1f Hz  missed %5d  errors %4d  max late %6.2f ms" % (
+                sensor, stats["achieved_hz"], stats["target_hz"], stats["missed"], stats["errors"],
+                stats["max_late_ms"]))
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print("Results written to " + args.output)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Most values a sensor reading can have. Readings with fewer are padded with NaN.
+max_values = 6
+
+# One row of the ring buffer: when the reading was taken (time.monotonic()), when it
+# was due, which sensor it came from, the sequence number it was written with, and its values.
+row_dtype = np.dtype([("time", "<f8"), ("deadline", "<f8"), ("sensor", "u1"), ("seq", "<i8"),
+                      ("values", "<f4", (max_values,))])
+
+# Rows kept in memory, about 20 s of data at the default rates.
+ring_capacity = 16384
+
+# Seconds between writes of new rows to disk and between status reports.
+write_interval = 0.5
+report_interval = 5.0
+
+# Fixed size ring buffer shared by every sensor. Writers claim a slot with an atomic
+# counter and never wait on each other or on readers; each row carries the sequence
+# number it was written with, so a reader can tell a complete row from one being
+# written or one that has already been overwritten. Every row is stamped with the same
+# monotonic clock, so readings from different sensors line up in time.
+class SampleRing:
+    def __init__(self, capacity=ring_capacity):
+        self.rows = np.zeros(capacity, dtype=row_dtype)
+        self.rows["seq"] = -1
+        self.capacity = capacity
+        self.counter = itertools.count()
+        self.written = 0
+
+    def append(self, sensor, deadline, timestamp, values):
+        seq = next(self.counter)
+        row = self.rows[seq % self.capacity]
+        row["seq"] = -1
+        row["time"] = timestamp
+        row["deadline"] = deadline
+        row["sensor"] = sensor
+        row["values"][:] = np.nan
+        row["values"][:len(values)] = values
+        row["seq"] = seq
+        self.written = max(self.written, seq + 1)
+
+    # Every complete row with a sequence number from seq on, in time order, and the sequence
+    # number to ask for next time. A row still being written stops the read there so it is
+    # picked up next time. Rows that were overwritten before they could be read are
+    # counted in the third value.
+    def since(self, seq):
+        end = self.written
+        lost = max(0, end - self.capacity - seq)
+        seq += lost
+        expected = np.arange(seq, end)
+        rows = self.rows[expected % self.capacity]
+        complete = rows["seq"] == expected
+        if not complete.all():
+            end = seq + int(np.argmin(complete))
+            rows = rows[:end - seq]
+        return rows[np.argsort(rows["time"], kind="stable")], end, lost
+
+    # Complete rows from the last seconds of data, in time order.
+    def window(self, seconds):
+        rows = self.rows[self.rows["seq"] >= 0]
+        rows = rows[rows["time"] >= time.monotonic() - seconds]
+        return rows[np.argsort(rows["time"], kind="stable")]
+
+# A sensor read at a fixed rate. read is called with no arguments and returns a sequence
+# of up to max_values numbers. Reads run on the sensor's own worker thread, so a slow
+# transaction only ever holds up its own sensor. A missed deadline is a slot on the
+# sensor's schedule that never got a reading, counted once, by the scheduler.
+class SensorTask:
+    def __init__(self, name, rate, read):
+        self.name = name
+        self.rate = rate
+        self.period = 1 / rate
+        self.read = read
+        self.id = None
+        self.ring = None
+        self.deadline = None
+        self.wake = threading.Semaphore(0)
+        self.busy = False
+        self.running = True
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.missed = 0
+        self.errors = 0
+        self.max_late = 0.0
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    # Count slots that went by without a reading.
+    def miss(self, count=1):
+        with self.lock:
+            self.missed += count
+
+    # Ask for a reading due at deadline. Returns False, and counts a missed deadline, if
+    # the last reading hasn't finished yet. A reading that runs past the next slot is
+    # counted here, when that slot finds the sensor still busy.
+    def trigger(self, deadline):
+        if self.busy:
+            self.miss()
+            return False
+        self.busy = True
+        self.deadline = deadline
+        self.wake.release()
+        return True
+
+    def run(self):
+        while True:
+            self.wake.acquire()
+            if not self.running:
+                return
+            deadline = self.deadline
+            try:
+                values = self.read()
+            except Exception:
+                self.errors += 1
+                values = None
+            now = time.monotonic()
+            self.max_late = max(self.max_late, now - deadline)
+            if values is not None:
+                self.ring.append(self.id, deadline, now, values)
+                self.samples += 1
+            self.busy = False
+
+    def stop(self):
+        self.running = False
+        self.wake.release()
+
+# Runs every sensor task at its own rate from one scheduler thread. The scheduler only
+# keeps time and hands out deadlines; the reads themselves happen on each task's worker.
+# If the scheduler wakes up so late that whole periods have gone by, those are counted
+# as missed deadlines for the sensor rather than being read in a burst to catch up.
+class Scheduler:
+    def __init__(self, tasks, ring):
+        self.tasks = tasks
+        self.ring = ring
+        self.running = True
+        for i, task in enumerate(tasks):
+            task.id = i
+            task.ring = ring
+        self.thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+
+    def start(self):
+        for task in self.tasks:
+            task.thread.start()
+        self.start_time = time.monotonic()
+        self.thread.start()
+
+    def run(self):
+        start = self.start_time
+        queue = [(start, i) for i in range(len(self.tasks))]
+        heapq.heapify(queue)
+        while self.running:
+            deadline, i = queue[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.monotonic()
+            task = self.tasks[i]
+            task.trigger(deadline)
+
+            # Schedule the next reading on the original grid so the rate doesn't drift,
+            # skipping any slots that have already gone by.
+            next_deadline = deadline + task.period
+            if next_deadline < now:
+                skipped = int((now - next_deadline) / task.period) + 1
+                task.miss(skipped)
+                next_deadline += skipped * task.period
+            heapq.heapreplace(queue, (next_deadline, i))
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        for task in self.tasks:
+            task.stop()
+
+        # Let any read in progress finish so its row makes it into the log.
+        for task in self.tasks:
+            task.thread.join(1.0)
+
+    # One line per sensor with its rate, missed deadlines and errors so far.
+    def report(self):
+        elapsed = time.monotonic() - self.start_time
+        lines = []
+        for task in self.tasks:
+            lines.append("%-8s target %6.1f Hz  achieved %6.1f Hz  missed %6d  errors %4d  max late %6.2f ms" % (
+                task.name, task.rate, task.samples / elapsed, task.missed, task.errors, task.max_late * 1000))
+        return "\n".join(lines)
+
+# The compressed log format is shared with the ground station, which keeps it with its
+# own scripts.
+ground_station_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Ground_Station_GUI")
+
+# Helper function for importing the compressed log writer shared with the ground station,
+# adding its directory to the search path the first time.
+def import_compressed_log():
+    if ground_station_dir not in sys.path:
+        sys.path.append(ground_station_dir)
+    import compressed_log
+    return compressed_log
+
+# Run tasks until duration seconds have passed (or until interrupted), writing every
+# row to file_name in blocks of row_dtype and printing a report now and then. With
+# compress set to "zlib" or "lzma", the rows go to a new compressed, rotating log
+# session named after file_name instead, compressed off the logging thread.
+def run_logger(tasks, file_name, duration=None, ring=None, compress=None):
+    ring = ring or SampleRing()
+    scheduler = Scheduler(tasks, ring)
+    seq = 0
+    lost = 0
+    last_report = time.monotonic()
+    if compress:
+        output = import_compressed_log().CompressedLogWriter(os.path.splitext(file_name)[0], compress)
+        print("Logging to " + output.session)
+    else:
+        output = open(file_name, "wb")
+    with output:
+        scheduler.start()
+        try:
+            while duration is None or time.monotonic() - scheduler.start_time < duration:
+                time.sleep(write_interval)
+                rows, seq, new_lost = ring.since(seq)
+                output.write(rows.tobytes())
+                lost += new_lost
+                if time.monotonic() - last_report > report_interval:
+                    print(scheduler.report())
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        scheduler.stop()
+        rows, seq, new_lost = ring.since(seq)
+        output.write(rows.tobytes())
+        lost += new_lost
+    return scheduler.report() + "\n%d rows written, %d lost to a full ring buffer" % (seq - lost, lost)
+
+# Helper function for loading a log written by run_logger, plain or compressed. Plain
+# logs still load without the ground station's directory around.
+def load(file_name):
+    try:
+        compressed_log = import_compressed_log()
+    except ImportError:
+        compressed_log = None
+    if compressed_log is not None and compressed_log.is_compressed_log(file_name):
+        return np.frombuffer(b"".join(compressed_log.read_records(file_name)), dtype=row_dtype)
+    return np.fromfile(file_name, dtype=row_dtype)
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Log every flight sensor on one schedule.")
+    parser.add_argument("output_file", nargs="?", default="flight_log.bin", help="file to log to")
+    parser.add_argument("--duration", type=float, help="seconds to log for (default: until Ctrl-C)")
+    parser.add_argument("--imu-rate", type=float, default=200)
+    parser.add_argument("--baro-rate", type=float, default=25)
+    parser.add_argument("--adxl337", metavar="PORT",
+                        help="serial port of the ADXL337's microcontroller (always simulated with --simulate)")
+    parser.add_argument("--adxl337-rate", type=float, default=500)
+    parser.add_argument("--adxl337-calibration", help="ADXL337 calibration file from adxl337.py --calibrate")
+    parser.add_argument("--simulate", action="store_true",
+                        help="fly a simulated flight profile instead of reading the real sensors")
+    parser.add_argument("--profile", help="recorded flight profile to simulate (.csv or .npz)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per I2C transaction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="simulated chance an I2C transaction fails")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="simulated chance an I2C transaction stalls")
+    parser.add_argument("--compress", choices=["zlib", "lzma"],
+                        help="log to a compressed, rotating session instead of one plain file")
+    parser.add_argument("--no-events", action="store_true", help="don't detect flight events while logging")
+    args = parser.parse_args()
+
+    from SensorDrivers import adxl337
+    from SensorDrivers.MPL3115A2 import MPL3115A2
+    from SensorDrivers.lsm9ds0 import LSM9DS0
+    from event_detector import EventDetector
+
+    # Each sensor gets its own handle on the bus so their transactions stay independent.
+    if args.simulate:
+        import simulation
+        profile = simulation.FlightProfile.from_file(args.profile) if args.profile else None
+        bus, clock = simulation.simulated_bus(profile, latency=args.latency, error_rate=args.error_rate,
+                                              stall_rate=args.stall_rate)
+        imu = LSM9DS0(bus)
+        baro = MPL3115A2(bus, osr=8)
+        adxl_port = simulation.SimulatedADXL337Serial(clock)
+    else:
+        import smbus
+        imu = LSM9DS0(smbus.SMBus(1))
+        baro = MPL3115A2(smbus.SMBus(1), osr=8)
+        adxl_port = None
+        if args.adxl337:
+            import serial
+            adxl_port = serial.Serial(args.adxl337, adxl337.baud_rate, timeout=0)
+
+    # The ADXL337 streams over serial on its own, so its task just takes the newest sample.
+    adxl = None
+    if adxl_port is not None:
+        calibration = (adxl337.Calibration.load(args.adxl337_calibration) if args.adxl337_calibration
+                       else adxl337.Calibration.nominal())
+        adxl = adxl337.CountReader(adxl_port, calibration)
+
+    # The IMU and barometer are read on different threads, so the detector is shared
+    # under a lock. The IMU's z axis points along the rocket.
+    detector = EventDetector(on_event=lambda event: print("%s at %.3f (detected %.3f)" % event))
+    detector_lock = threading.Lock()
+
+    def read_imu():
+        accel, gyro = imu.read_accel(), imu.read_gyro()
+        if accel is None or gyro is None:
+            return None
+        if not args.no_events:
+            with detector_lock:
+                detector.accel(time.monotonic(), accel[2])
+        return np.concatenate((accel, gyro))
+
+    def read_baro():
+        sample = baro.sample()
+        if not args.no_events:
+            with detector_lock:
+                detector.baro(time.monotonic(), sample.altitude)
+        return sample.altitude, sample.pressure, sample.temperature
+
+    tasks = [SensorTask("imu", args.imu_rate, read_imu),
+             SensorTask("baro", args.baro_rate, read_baro)]
+    if adxl is not None:
+        tasks.append(SensorTask("adxl337", args.adxl337_rate, adxl.read))
+    print(run_logger(tasks, args.output_file, args.duration, compress=args.compress))
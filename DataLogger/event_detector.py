@@ -0,0 +1,157 @@
+import collections
+
+# Standard gravity in m/s^2.
+g = 9.80665
+
+# Noise of the accelerometer (g) and barometric altitude (m), used to tune the filter.
+# Under canopy the accelerometer misses the parachute shocks and swinging, so after
+# apogee the filter leans on the barometer instead.
+accel_noise = 0.05
+descent_accel_noise = 1.0
+baro_noise = 0.6
+
+# Weight given to each new pad reading when averaging the ground altitude and 1 g reading.
+pad_weight = 0.02
+
+# A detected flight event. time is when the event is estimated to have happened and
+# detected is the time of the sample it was detected on, both on the sensors' clock.
+Event = collections.namedtuple("Event", ["name", "time", "detected"])
+
+# Streaming flight event detector. Axial acceleration from the IMU and altitude from the
+# barometer go into a two state (altitude, vertical velocity) Kalman filter: each
+# acceleration sample moves the state forward and each altitude sample corrects it. The
+# events are found from the filtered state and the raw acceleration:
+#
+#   liftoff   acceleration over liftoff_accel for hold seconds, or climbing faster than
+#             liftoff_speed (in case the accelerometer is saturated or missing)
+#   burnout   acceleration under burnout_accel for hold seconds after liftoff
+#   apogee    filtered vertical velocity below zero for hold seconds after liftoff
+#   landing   filtered vertical speed under landing_speed for landing_hold seconds
+#
+# Each sample is a fixed handful of float operations with no history kept, so the cost
+# per sample doesn't change over a flight. Times are in seconds and accelerations are
+# the accelerometer's reading along the rocket's axis in g (1 g sitting on the pad).
+class EventDetector:
+    def __init__(self, liftoff_accel=1.8, liftoff_speed=20.0, burnout_accel=0.5, landing_speed=1.0,
+                 hold=0.05, landing_hold=2.0, min_apogee=10.0, on_event=None):
+        self.liftoff_accel = liftoff_accel
+        self.liftoff_speed = liftoff_speed
+        self.burnout_accel = burnout_accel
+        self.landing_speed = landing_speed
+        self.hold = hold
+        self.landing_hold = landing_hold
+        self.min_apogee = min_apogee
+        self.on_event = on_event
+        self.phase = "pad"
+        self.events = []
+
+        # Filter state: altitude above the ground (m), vertical velocity (m/s) and covariance.
+        self.h = 0.0
+        self.v = 0.0
+        self.p00, self.p01, self.p11 = 100.0, 0.0, 10.0
+        self.accel_var = (accel_noise * g) ** 2
+        self.baro_var = baro_noise ** 2
+        self.last_time = None
+        self.last_accel = 0.0
+
+        # Ground altitude and 1 g reading, averaged while on the pad.
+        self.ground = None
+        self.one_g = 1.0
+
+        # Start time of the condition being held for each event, or None.
+        self.since = {}
+
+    def fire(self, name, event_time, detected):
+        event = Event(name, event_time, detected)
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # Start time of a condition that is true now, or None once it goes false.
+    def held(self, name, condition, t):
+        if not condition:
+            self.since[name] = None
+            return None
+        start = self.since.get(name)
+        if start is None:
+            self.since[name] = start = t
+        return start
+
+    # Move the filter forward to time t with vertical acceleration a (m/s^2).
+    def predict(self, t, a):
+        if self.last_time is None:
+            self.last_time = t
+            return
+        dt = t - self.last_time
+        if dt <= 0:
+            return
+        self.last_time = t
+        self.h += self.v * dt + 0.5 * a * dt * dt
+        self.v += a * dt
+
+        # P = F P F' + Q, with Q from white acceleration noise.
+        q = self.accel_var
+        p00 = self.p00 + dt * (2 * self.p01 + dt * self.p11) + q * dt ** 4 / 4
+        p01 = self.p01 + dt * self.p11 + q * dt ** 3 / 2
+        self.p11 += q * dt * dt
+        self.p00, self.p01 = p00, p01
+
+    # Feed an accelerometer sample: axial acceleration accel (g) at time t.
+    def accel(self, t, accel):
+        if self.phase == "pad" and accel < self.liftoff_accel:
+            self.one_g += pad_weight * (accel - self.one_g)
+        self.last_accel = (accel / self.one_g - 1) * g
+        self.predict(t, self.last_accel)
+
+        if self.phase == "pad":
+            start = self.held("boost", accel > self.liftoff_accel, t)
+            if start is not None and t - start >= self.hold:
+                self.liftoff(start, t)
+        elif self.phase == "boost":
+            start = self.held("burnout", accel < self.burnout_accel, t)
+            if start is not None and t - start >= self.hold:
+                self.phase = "coast"
+                self.fire("burnout", start, t)
+        self.check_state(t)
+
+    # Feed a barometer sample: altitude (m) at time t.
+    def baro(self, t, altitude):
+        if self.ground is None:
+            self.ground = altitude
+        if self.phase == "pad":
+            self.ground += pad_weight * (altitude - self.ground)
+
+        # Move up to t with the last acceleration, then correct with the measured altitude.
+        self.predict(t, self.last_accel)
+        s = self.p00 + self.baro_var
+        k0, k1 = self.p00 / s, self.p01 / s
+        residual = altitude - self.ground - self.h
+        self.h += k0 * residual
+        self.v += k1 * residual
+        self.p11 -= k1 * self.p01
+        self.p01 -= k0 * self.p01
+        self.p00 -= k0 * self.p00
+
+        if self.phase == "pad" and self.v > self.liftoff_speed:
+            self.liftoff(t, t)
+        self.check_state(t)
+
+    def liftoff(self, start, t):
+        self.phase = "boost"
+        self.fire("liftoff", start, t)
+
+    # Events found from the filtered state.
+    def check_state(self, t):
+        if self.phase in ("boost", "coast"):
+            start = self.held("apogee", self.v < 0 and self.h > self.min_apogee, t)
+            if start is not None and t - start >= self.hold:
+                if self.phase == "boost":
+                    self.fire("burnout", start, t)
+                self.phase = "descent"
+                self.accel_var = (descent_accel_noise * g) ** 2
+                self.fire("apogee", start, t)
+        elif self.phase == "descent":
+            start = self.held("landing", abs(self.v) < self.landing_speed, t)
+            if start is not None and t - start >= self.landing_hold:
+                self.phase = "landed"
+                self.fire("landing", start, t)
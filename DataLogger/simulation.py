@@ -0,0 +1,341 @@
+import errno
+import math
+import random
+import threading
+import time
+import numpy as np
+from SensorDrivers import MPL3115A2 as mpl
+from SensorDrivers import adxl337
+from SensorDrivers import lsm9ds0 as imu
+
+# Standard gravity in m/s^2.
+g = 9.80665
+
+# Time step profiles are worked out on, in seconds.
+profile_step = 0.001
+
+# Vertical flight of a rocket through time, as altitude (m), vertical velocity (m/s) and
+# the specific force along the rocket's axis (m/s^2, what an accelerometer would read, so
+# +g sitting on the pad), sampled on a fine grid. Time 0 is launch.
+class FlightProfile:
+    def __init__(self, times, altitude, velocity, acceleration):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.altitude = np.asarray(altitude, dtype=np.float64)
+        self.velocity = np.asarray(velocity, dtype=np.float64)
+        self.acceleration = np.asarray(acceleration, dtype=np.float64)
+        self.apogee_time = float(self.times[np.argmax(self.altitude)])
+        self.apogee = float(self.altitude.max())
+        self.duration = float(self.times[-1])
+
+    # Synthetic flight: a constant thrust boost, a coast slowed by gravity and drag up to
+    # apogee, then descent under a drogue and finally the main parachute. The defaults
+    # give an apogee of about a mile.
+    @classmethod
+    def synthetic(cls, boost_accel=80.0, burn_time=2.5, drag=0.0002, drogue_rate=25.0,
+                  main_rate=6.0, main_altitude=250.0):
+        times = [0.0]
+        altitude = [0.0]
+        velocity = [0.0]
+        acceleration = [g]
+        t, h, v = 0.0, 0.0, 0.0
+
+        # Boost and coast, integrated step by step until the rocket stops climbing.
+        while t < burn_time or v > 0:
+            thrust = boost_accel + g if t < burn_time else 0.0
+            drag_accel = drag * v * abs(v)
+            a = thrust - g - drag_accel
+            v += a * profile_step
+            h += v * profile_step
+            t += profile_step
+            times.append(t)
+            altitude.append(h)
+            velocity.append(v)
+            acceleration.append(thrust - drag_accel)
+
+        # Under canopy the rocket falls at a steady rate, so the accelerometer reads 1 g.
+        # The drogue comes out at apogee and the main at main_altitude.
+        drogue_end = t + max(0.0, h - main_altitude) / drogue_rate
+        landing = drogue_end + min(h, main_altitude) / main_rate
+        descent = np.arange(t + profile_step, landing, profile_step)
+        descent_altitude = np.where(descent < drogue_end, h - (descent - t) * drogue_rate,
+                                    min(h, main_altitude) - (descent - drogue_end) * main_rate)
+        descent_velocity = np.where(descent < drogue_end, -drogue_rate, -main_rate)
+        return cls(np.concatenate((times, descent)), np.concatenate((altitude, np.maximum(descent_altitude, 0))),
+                   np.concatenate((velocity, descent_velocity)), np.concatenate((acceleration, np.full(len(descent), g))))
+
+    # Recorded flight from a .csv (time, altitude[, acceleration] columns with a header
+    # line) or .npz (arrays of the same names). Velocity, and acceleration if it is
+    # missing, are worked out from the altitude.
+    @classmethod
+    def from_file(cls, file_name):
+        if file_name.endswith(".npz"):
+            data = np.load(file_name)
+            columns = {name: data[name] for name in data.files}
+        else:
+            table = np.genfromtxt(file_name, delimiter=",", names=True)
+            columns = {name: table[name] for name in table.dtype.names}
+        times, altitude = columns["time"], columns["altitude"]
+        velocity = np.gradient(altitude, times)
+        acceleration = columns.get("acceleration")
+        if acceleration is None:
+            acceleration = np.gradient(velocity, times) + g
+        return cls(times - times[0], altitude, velocity, acceleration)
+
+    # Altitude, vertical velocity and axial specific force at time t after launch. Before
+    # launch the rocket is on the pad and after landing it stays where it came down.
+    def at(self, t):
+        if t <= 0:
+            return self.altitude[0], 0.0, g
+        if t >= self.duration:
+            return self.altitude[-1], 0.0, g
+        i = int(np.searchsorted(self.times, t))
+        return self.altitude[i], self.velocity[i], self.acceleration[i]
+
+# Helper function for the standard atmosphere pressure in Pa at an altitude in meters.
+def altitude_pressure(altitude, reference=mpl.sea_level_pressure):
+    return reference * (1 - altitude / 44330.77) ** (1 / 0.1902632)
+
+# Clock shared by the simulated sensors. Flight time starts counting pad_time seconds after
+# the clock is created, and runs speed times faster than real time.
+class FlightClock:
+    def __init__(self, profile, pad_time=1.0, speed=1.0, launch_altitude=0.0):
+        self.profile = profile
+        self.start = time.monotonic() + pad_time
+        self.speed = speed
+        self.launch_altitude = launch_altitude
+
+    def flight_time(self):
+        return (time.monotonic() - self.start) * self.speed
+
+    # Altitude above sea level, vertical velocity and axial specific force right now.
+    def state(self):
+        altitude, velocity, acceleration = self.profile.at(self.flight_time())
+        return altitude + self.launch_altitude, velocity, acceleration
+
+# Register model of an MPL3115A2 in one shot mode. A measurement started with OST
+# finishes after the conversion time for the oversampling ratio, and reads the flight
+# profile's altitude (or pressure) at that moment with noise that shrinks with the OSR.
+class SimulatedMPL3115A2:
+    address = mpl.address
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.ctrl = 0
+        self.ready_at = None
+        self.data = [0] * 6
+
+    def write(self, register, value):
+        if register == mpl.CTRL_REG1:
+            self.ctrl = value
+            if value & mpl.CTRL_OST:
+                osr = 1 << ((value >> 3) & 0x07)
+                self.ready_at = time.monotonic() + mpl.conversion_time[osr] / self.clock.speed
+                self.osr = osr
+
+    def measure(self):
+        altitude, _, _ = self.clock.state()
+        altitude += random.gauss(0, 1.5 / math.sqrt(self.osr))
+        temperature = 15.0 - 0.0065 * altitude
+        if self.ctrl & mpl.CTRL_ALT:
+            raw = int(round(altitude * 256)) & 0xFFFFF0
+        else:
+            raw = int(round(altitude_pressure(altitude) * 4)) << 4
+        raw_t = int(round(temperature * 256)) & 0xFFF0
+        self.data = [mpl.STATUS_PTDR, (raw >> 16) & 0xFF, (raw >> 8) & 0xFF, raw & 0xFF, raw_t >> 8, raw_t & 0xFF]
+        self.ready_at = None
+
+    def ready(self):
+        if self.ready_at is not None and time.monotonic() >= self.ready_at:
+            self.measure()
+        return self.data[0]
+
+    def read(self, register, length):
+        self.ready()
+        if register == mpl.STATUS:
+            data = self.data[:length]
+            self.data[0] = 0
+            return data
+        return [0] * length
+
+    def read_byte(self, register):
+        if register == mpl.STATUS:
+            return self.ready()
+        return self.ctrl if register == mpl.CTRL_REG1 else 0
+
+# Output data rates in Hz by the control register value that selects them.
+accel_rate_values = {value: rate for rate, value in imu.accel_rates.items()}
+gyro_rate_values = {value: rate for rate, value in imu.gyro_rates.items()}
+mag_rate_values = {value: rate for rate, value in imu.mag_rates.items()}
+
+# Sensitivities in g/LSB and dps/LSB by full scale register value, so readings saturate
+# wherever the driver set the range.
+accel_scale_values = {0x00: 0.061e-3, 0x08: 0.122e-3, 0x10: 0.183e-3, 0x18: 0.244e-3, imu.ACCEL_FS_16G: imu.accel_scale}
+gyro_scale_values = {0x00: 8.75e-3, 0x10: 17.5e-3, imu.GYRO_FS_2000DPS: imu.gyro_scale, 0x30: imu.gyro_scale}
+
+# Register model of one half of an LSM9DS0 (the gyro, or the accel/mag). New samples
+# appear at the configured output data rates, with the FIFO filling in stream mode.
+# The rocket is modeled flying straight up along z with a slow roll.
+class SimulatedLSM9DS0:
+    def __init__(self, clock, address):
+        self.clock = clock
+        self.address = address
+        self.registers = {}
+        self.last_read = {}
+        self.fifo_read = 0
+        self.fifo_start = time.monotonic()
+
+    # Output data rate in Hz of the samples behind a status register.
+    def rate(self, register):
+        if self.address == imu.gyro_address:
+            return gyro_rate_values.get(self.registers.get(imu.CTRL_REG1_G), 95)
+        if register == imu.STATUS_REG_M:
+            return mag_rate_values.get(self.registers.get(imu.CTRL_REG5_XM, 0) & 0x1C, 50)
+        return accel_rate_values.get(self.registers.get(imu.CTRL_REG1_XM), 100)
+
+    def write(self, register, value):
+        self.registers[register] = value
+        if register in (imu.FIFO_CTRL_REG, imu.FIFO_CTRL_REG_G):
+            self.fifo_start = time.monotonic()
+            self.fifo_read = 0
+
+    # Raw readings of one sample for the status register it sits behind.
+    def sample(self, register):
+        _, velocity, acceleration = self.clock.state()
+        if register == imu.STATUS_REG_M:
+            values, scale = (0.2, 0.0, 0.45), imu.mag_scale
+        elif self.address == imu.gyro_address:
+            scale = gyro_scale_values[self.registers.get(imu.CTRL_REG4_G, 0x00) & 0x30]
+            values = (0.0, 0.0, 30.0 if velocity > 0 else 0.0)
+        else:
+            scale = accel_scale_values[self.registers.get(imu.CTRL_REG2_XM, 0x00) & 0x38]
+            values = (0.0, 0.0, acceleration / g)
+        data = []
+        for value in values:
+            raw = int(round((value + random.gauss(0, 0.01)) / scale))
+            raw = max(-32768, min(32767, raw)) & 0xFFFF
+            data += [raw & 0xFF, raw >> 8]
+        return data
+
+    # Samples produced at the data rate since the time since.
+    def pending(self, register, since):
+        return int((time.monotonic() - since) * self.clock.speed * self.rate(register))
+
+    def read(self, register, length):
+        register &= ~imu.AUTO_INCREMENT
+        if register in (imu.STATUS_REG_A, imu.STATUS_REG_M):
+            produced = self.pending(register, self.fifo_start)
+            new = produced > self.last_read.get(register, -1)
+            self.last_read[register] = produced
+            return ([imu.DATA_READY if new else 0] + self.sample(register))[:length]
+        if register == imu.OUT_X_L:
+            count = length // 6
+            self.fifo_read += count
+            return sum((self.sample(imu.STATUS_REG_A) for _ in range(count)), [])
+        return [0] * length
+
+    def read_byte(self, register):
+        if register in (imu.FIFO_SRC_REG, imu.FIFO_SRC_REG_G):
+            # Stream mode keeps the newest 32 samples, dropping older ones.
+            waiting = self.pending(imu.STATUS_REG_A, self.fifo_start) - self.fifo_read
+            if waiting > imu.fifo_depth - 1:
+                self.fifo_read += waiting - (imu.fifo_depth - 1)
+                waiting = imu.fifo_depth - 1
+            return waiting
+        return self.registers.get(register, 0)
+
+# Stand-in for the serial port of an ADXL337 on a microcontroller running ADXL337_example,
+# with the sensor's z axis along the rocket. Lines of raw counts are produced at the
+# sketch's sample rate from the flight profile, inverting the nominal calibration for
+# reference and clipping to what the ADC can read, like the real sensor saturating.
+# Samples the reader falls too far behind on are dropped, as by a full serial buffer.
+class SimulatedADXL337Serial:
+    def __init__(self, clock, reference=5.0, buffer_size=4096):
+        self.clock = clock
+        calibration = adxl337.Calibration.nominal(reference)
+        self.inverse = np.linalg.inv(calibration.gain.astype(np.float64))
+        self.bias = calibration.bias
+        self.max_count = int(adxl337.adc_max * min(1.0, adxl337.sensor_supply / reference))
+        self.buffer_size = buffer_size
+        self.start = time.monotonic()
+        self.produced = 0
+        self.buffer = b""
+
+    # Add the lines produced since the last look.
+    def fill(self):
+        produced = int((time.monotonic() - self.start) * self.clock.speed * adxl337.sample_rate)
+        if produced <= self.produced:
+            return
+        _, _, acceleration = self.clock.state()
+        lines = []
+        for _ in range(min(produced - self.produced, self.buffer_size // 12)):
+            value = np.array((0.0, 0.0, acceleration / g)) + np.random.normal(0, 0.01, 3)
+            counts = np.clip(np.round((value - self.bias) @ self.inverse), 0, self.max_count)
+            lines.append(b"%d,%d,%d\n" % tuple(counts))
+        self.produced = produced
+        self.buffer = (self.buffer + b"".join(lines))[-self.buffer_size:]
+
+    @property
+    def in_waiting(self):
+        self.fill()
+        return len(self.buffer)
+
+    def read(self, size=1):
+        self.fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+# Stand-in for smbus.SMBus that routes each transaction to simulated devices by address.
+# Transactions are serialized like on a real bus and each one takes latency seconds
+# plus per_byte seconds per byte moved (22.5 us is 400 kHz I2C). Faults can be injected:
+# with probability error_rate a transaction fails with the same OSError smbus raises, and
+# with probability stall_rate it takes stall_time seconds longer (a slave stretching the
+# clock). Counts of transactions, errors and stalls are kept.
+class SimulatedBus:
+    def __init__(self, devices, latency=0.0, per_byte=22.5e-6, error_rate=0.0, stall_rate=0.0, stall_time=0.05):
+        self.devices = {}
+        for device in devices:
+            self.devices[device.address] = device
+        self.latency = latency
+        self.per_byte = per_byte
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.errors = 0
+        self.stalls = 0
+
+    def transaction(self, address, size):
+        self.transactions += 1
+        delay = self.latency + self.per_byte * (size + 2)
+        if self.stall_rate and random.random() < self.stall_rate:
+            self.stalls += 1
+            delay += self.stall_time
+        if delay > 0:
+            time.sleep(delay)
+        if address not in self.devices:
+            raise OSError(errno.ENXIO, "No such device or address")
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            raise OSError(errno.EIO, "Remote I/O error")
+        return self.devices[address]
+
+    def write_byte_data(self, address, register, value):
+        with self.lock:
+            self.transaction(address, 2).write(register, value)
+
+    def read_byte_data(self, address, register):
+        with self.lock:
+            return self.transaction(address, 2).read_byte(register)
+
+    def read_i2c_block_data(self, address, register, length):
+        with self.lock:
+            return self.transaction(address, length + 1).read(register, length)
+
+# Helper function for a simulated bus with an MPL3115A2 and an LSM9DS0 flying profile.
+def simulated_bus(profile=None, pad_time=1.0, speed=1.0, **faults):
+    clock = FlightClock(profile or FlightProfile.synthetic(), pad_time, speed)
+    devices = [SimulatedMPL3115A2(clock),
+               SimulatedLSM9DS0(clock, imu.gyro_address),
+               SimulatedLSM9DS0(clock, imu.xm_address)]
+    return SimulatedBus(devices, **faults), clock
@@ -1,257 +1,201 @@
 #!/usr/bin/env python3
 
-import glob
-import math
-import matplotlib.pyplot as plt
-import re
+import argparse
+import binlog
+import fix_server
+import gprmc
 import serial
-import sys
-import utm
-
-# Helper function for discovering serial ports.
-def find_serial_ports():
-    if sys.platform.startswith("win"):
-        ports = ["COM%s" % (i + 1) for i in range(256)]
-    elif sys.platform.startswith("linux") or sys.platform.startswith("cygwin"):
-        # This excludes your current terminal "/dev/tty".
-        ports = glob.glob("/dev/tty[A-Za-z]*")
-    elif sys.platform.startswith("darwin"):
-        ports = glob.glob("/dev/tty.*")
-    else:
-        raise EnvironmentError("Unsupported platform")
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
+import signal
+import threading
+import time
+from compressed_log import CompressedLogWriter
+from display import display_available
+from framer import RecordFramer
+from metrics import Metrics
+from serial_ports import choose_serial_port
 
 if __name__ == "__main__":
-    # Detername name of serial port.
-    ports = find_serial_ports()
-    if len(ports) == 0:
-        raise Exception("No serial ports found")
-    elif len(ports) > 1:
-        print("Multiple serial ports found: ", ports)
-        port_name = input("Enter the port you would like to use: ")
-        while port_name not in ports:
-            print("Error: not a port name")
-            port_name = input("Enter the port you would like to use: ")
-    else:
-        port_name = ports[0]
-
-    # Declare plot variables.
-    s_x_data, s_y_data, r_x_data, r_y_data = [0], [0], [0], [0]
-    s_text, r_text = None, None
-
-    # Create plot.
-    fig, (s_ax, r_ax) = plt.subplots(1, 2)
-    s_line, = s_ax.plot(s_x_data, s_y_data)
-    r_line, = r_ax.plot(r_x_data, r_y_data)
-    plt.show(block=False)
-    fig.canvas.draw()
-
-    # Set to fullscreen, square axes.
-    mng = plt.get_current_fig_manager()
-    mng.window.state("zoomed")
-    plt.gca().set_aspect("equal", adjustable="box")
-    
-    # Set labels and create grid.
-    s_ax.set_title("Launch Vehicle Drift (Summer)")
-    s_ax.set_xlabel("East (m)")
-    s_ax.set_ylabel("North (m)")
-    s_ax.grid(color="k", linestyle="-", linewidth=0.5)
-
-    r_ax.set_title("Launch Vehicle Drift (Rick)")
-    r_ax.set_xlabel("East (m)")
-    r_ax.set_ylabel("North (m)")
-    r_ax.grid(color="k", linestyle="-", linewidth=0.5)
-
-    # Regex for extracting time, latitude, and longitude.
-    time_pattern = re.compile(r"([0-9]{2})([0-9]{2})([0-9]{2}\.[0-9]{3}),A")
-    lat_pattern  = re.compile(r"([0-9]{2})([0-9]{2}\.[0-9]+),(N|S)")
-    lon_pattern  = re.compile(r"([0-9]{3})([0-9]{2}\.[0-9]+),(E|W)")
-
-    # Defines paramaters for distance/angle text box.
-    props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
-    
-    # Flags for whether or not the origin has been read.
-    s_read_origin = False
-    r_read_origin = False
-
-    # Opens a file named output.txt for writing the serial data to.
-    output = open("output.txt", "w")
-
-    # Opens serial port at port_name with 9600 baud and 3 second timeout.
-    ser = serial.Serial(port_name, 9600, timeout=30000)
-
-    while True:
-        # Read characters until we find the "@" delimiter.
-        while ser.read() != b"@":
-            pass
-
-        # Read a line of GPS data and discard the next two characters (?,).
-        ser_line = ser.read(50)
-        ser.read(2)
-
-        # Try to get the name of the ATU.
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Plot the drift of several ATUs live from the ground station radio.")
+    parser.add_argument("--overlay", action="store_true",
+                        help="show fix rate, age of the newest fix and error counts on the plots")
+    parser.add_argument("--metrics-log", default="metrics.log",
+                        help="file to append per-stage timings and counters to")
+    parser.add_argument("--output", default="output",
+                        help="base name of the session's logs, which get the start time appended")
+    parser.add_argument("--serve", type=int, nargs="?", const=fix_server.default_port, metavar="PORT",
+                        help="publish every fix for viewers started with fix_server.py to subscribe to")
+    parser.add_argument("--serve-host", default=fix_server.default_host,
+                        help="address to publish on (0.0.0.0 to let other machines subscribe)")
+    parser.add_argument("--headless", action="store_true",
+                        help="only log (and publish) fixes, without loading the plotting libraries; "
+                             "the default when there is no display")
+    args = parser.parse_args()
+
+    # Without a display there is nothing to plot on, so just log.
+    headless = args.headless
+    if not headless and not display_available():
+        print("No display found, running headless")
+        headless = True
+
+    # Detername name of serial port, reusing the last one if it is still there.
+    port_name = choose_serial_port()
+
+    # The plotting libraries take most of the startup time, so they are only loaded when
+    # there is a plot to draw.
+    if not headless:
+        import matplotlib.pyplot as plt
+        from plot_renderer import maximize
+        from projection import Projector
+        from tracker import ATUTracker
+
+        # Create an empty figure, subplots are added as each ATU is first heard from.
+        fig = plt.figure()
+        plt.show(block=False)
+        fig.canvas.draw()
+
+        # Set to fullscreen.
+        maximize(fig)
+
+        # Defines paramaters for distance/angle text box.
+        props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
+
+        # Keeps a track, subplot and renderer per ATU.
+        tracker = ATUTracker(fig, props)
+
+    # Projection from lat/lon to meters, set up from the first fix.
+    projector = None
+
+    # Starts a new compressed log session for the serial data (read back with
+    # compressed_log.py), and a .bin log of the same name for a compact binary copy of
+    # every fix. Earlier sessions are never overwritten.
+    output = CompressedLogWriter(args.output)
+    binary_output = binlog.BinaryLogWriter(output.session + ".bin")
+    print("Logging to " + output.session)
+    if headless:
+        print("Watch it with: python Ground_Station_GUI_no_serial.py {0} --follow".format(output.session))
+
+    # Opens serial port at port_name with 9600 baud and a 1 second timeout, so Ctrl-C is
+    # noticed even while the radio is quiet.
+    ser = serial.Serial(port_name, 9600, timeout=1)
+
+    # Splits the serial stream into records however they arrive.
+    framer = RecordFramer()
+    records = []
+
+    # Time each stage of the pipeline and count records that are skipped.
+    metrics = Metrics(args.metrics_log)
+
+    # Publish fixes for other viewers on a background thread if asked to.
+    server = None
+    if args.serve is not None:
+        server = fix_server.FixServer(args.serve_host, args.serve)
+        server.start()
+        print("Publishing fixes on {0}:{1}".format(*server.address[:2]))
+
+    # Run until Ctrl-C, then fall through to closing everything so the last of the logs
+    # makes it to disk.
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    while not stopping.is_set():
+        # Wait for the next complete record (<GPS data>?,<name>), however long the ATU name is.
+        while len(records) == 0 and not stopping.is_set():
+            metrics.maybe_write()
+            output.maybe_flush()
+            binary_output.maybe_flush()
+            start = time.perf_counter()
+            records = framer.read(ser)
+            arrival = time.perf_counter()
+            metrics.record("serial", start)
+            metrics.set("framing_errors", framer.framing_errors)
+            metrics.set("log_dropped", output.dropped)
+            metrics.set("binlog_dropped", binary_output.dropped)
+
+            # The radio has gone quiet, so draw any update the frame rate cap held back,
+            # such as the last fixes before landing.
+            if len(records) == 0 and not headless:
+                tracker.render(metrics.overlay() if args.overlay else None, force=True)
+        if len(records) == 0:
+            break
+        record = records.pop(0)
+
+        # Split the record into GPS data and the name of the ATU.
+        start = time.perf_counter()
         try:
-            atu_name = ser.read(4).decode("utf-8")
-            if atu_name == "summ":
-                atu_name += "er"
-                ser.read(2)     # Discard the "er".
-            str_to_print = (atu_name + ":").ljust(8)
-            print(str_to_print, end="")
-            output.write(str_to_print)
+            cur_line, _, atu_name = record.decode("utf-8").rpartition("?,")
         except UnicodeDecodeError:
-            print("Unable to decode ATU name")
+            metrics.count("undecodable")
             continue
+        metrics.record("decode", start)
 
-        # Try to decode the line, report a malformed line and skip it if we can't.
-        try:
-            cur_line = ser_line.decode("utf-8")
-        except UnicodeDecodeError:
-            print("Unable to decode GPS data")
+        # If no name is found, or it isn't one the binary log can hold, skip to next data set.
+        if (not cur_line or not atu_name.isascii() or not atu_name.isalnum()
+                or len(atu_name) > binlog.name_size):
+            metrics.count("unknown_atu")
             continue
 
         # Skip data sent while ATU is not locked.
         if cur_line.endswith("0000.0000,N,00000.0000,E,000.0"):
-            print("Sensor not locked")
+            metrics.count("not_locked")
             continue
 
-        # Extract the time and break into hours, minutes, seconds.
-        match = re.search(time_pattern, cur_line)
-        if match is not None:
-            hour   = int(match.group(1))
-            minute = int(match.group(2))
-            second = float(match.group(3))
+        # Decode the time, latitude, and longitude in one pass.
+        start = time.perf_counter()
+        fix = gprmc.parse_sentence(cur_line)
+        metrics.record("parse", start)
 
-        # If the data does not match the expected format, skip it.
-        else:
-            print("Time did not match expected regex format")
+        # If the data does not match the expected format or has no lock, skip it.
+        if fix is None:
+            metrics.count("unparsed")
             continue
-
-        # Extract the latitude and convert to decimal degree form.
-        match = re.search(lat_pattern, cur_line)
-        if match is not None:
-            deg = float(match.group(1))
-            min = float(match.group(2))
-            lat = deg + (min / 60)
-            if str(match.group(3)) == "S":
-                lat = -lat
-
-        # If the data does not match the expected format, skip it.
-        else:
-            print("Latitude did not match expected regex format")
+        if not fix.valid:
+            metrics.count("not_locked")
             continue
+        metrics.fix(arrival)
 
-        # Extract the longitude and convert to decimal degree form.
-        match = re.search(lon_pattern, cur_line)
-        if match is not None:
-            deg = float(match.group(1))
-            min = float(match.group(2))
-            lon = deg + (min / 60)
-            if str(match.group(3)) == "W":
-                lon = -lon
-
-        # If the data does not match the expected format, skip it.
-        else:
-            print("Longitude did not match expected regex format")
+        # Write the ATU name, time, latitude, and longitude to stdout and output files.
+        start = time.perf_counter()
+        try:
+            binary_output.write(fix, atu_name)
+        except ValueError:
+            metrics.count("unknown_atu")
+            continue
+        output_str = (atu_name + ":").ljust(8) + gprmc.format_fix(fix.time, fix.lat, fix.lon)
+        output.write(output_str + "\n")
+        metrics.record("write", start)
+
+        # Pass the fix on to any viewers.
+        if server is not None:
+            start = time.perf_counter()
+            server.publish(fix, atu_name)
+            metrics.record("publish", start)
+        print(output_str)
+
+        # Everything else is only for the plot.
+        if headless:
             continue
 
-        # Write time, latitude, and longitude to stdout and output file.
-        second_str = "{0:.3f}".format(second).zfill(6)
-        output_str = "{0:02d}:{1:02d}:{2} -> {3:.4f}, {4:.4f}"
-        output.write(output_str.format(hour, minute, second_str, lat, lon) + "\n")
-        print(output_str.format(hour, minute, second_str, lat, lon))
-
-        # Convert lat/lon into UTM (standardized 2D cartesian projection).
-        x, y, _, _ = utm.from_latlon(lat, lon)
-
-        # If the data came from Summer.
-        if atu_name == "summer":
-
-            # Set first point as origin (0,0).
-            if not s_read_origin:
-                s_x_origin = x
-                s_y_origin = y
-                s_read_origin = True
-
-            # All other points are relative to this origin.
-            else:
-                x = x - s_x_origin
-                y = y - s_y_origin
-
-                # Add new data point.
-                s_x_data.append(x)
-                s_y_data.append(y)
-                s_line.set_xdata(s_x_data)
-                s_line.set_ydata(s_y_data)
-
-                # Compute and print absolute distance and angle from origin.
-                dist  = math.sqrt(x**2 + y**2)
-                angle = math.degrees(math.atan2(y,x))
-                if s_text is not None:
-                    s_text.remove()
-                text = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
-                s_text = s_ax.text(0.05, 0.05, text, fontsize=12, transform=s_ax.transAxes, bbox=props)
-
-                # Redraw plot and adjust axes.
-                s_ax.draw_artist(s_ax.patch)
-                s_ax.draw_artist(s_line)
-                s_ax.relim()
-                s_ax.autoscale_view()
-                fig.canvas.draw()
-                fig.canvas.flush_events()
-            
-        # If the data came from Rick.
-        elif atu_name == "rick":
-            
-            # Set first point as origin (0,0).
-            if not r_read_origin:
-                r_x_origin = x
-                r_y_origin = y
-                r_read_origin = True
-
-            # All other points are relative to this origin.
-            else:
-                x = x - r_x_origin
-                y = y - r_y_origin
-
-                # Add new data point
-                r_x_data.append(x)
-                r_y_data.append(y)
-                r_line.set_xdata(r_x_data)
-                r_line.set_ydata(r_y_data)
-
-                # Compute and print absolute distance and angle from origin.
-                dist  = math.sqrt(x**2 + y**2)
-                angle = math.degrees(math.atan2(y,x))
-                if r_text is not None:
-                    r_text.remove()
-                text = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
-                r_text = r_ax.text(0.05, 0.05, text, fontsize=12, transform=r_ax.transAxes, bbox=props)
+        # Convert lat/lon into UTM (standardized 2D cartesian projection), in the zone of the first fix.
+        start = time.perf_counter()
+        if projector is None:
+            projector = Projector(fix.lat, fix.lon)
+        x, y = projector.project(fix.lat, fix.lon)
+        metrics.record("utm", start)
 
-                # Redraw plot and adjust axes.
-                r_ax.draw_artist(r_ax.patch)
-                r_ax.draw_artist(r_line)
-                r_ax.relim()
-                r_ax.autoscale_view()
-                fig.canvas.draw()
-                fig.canvas.flush_events()
+        # Add the point to this ATU's track and redraw at most once per frame.
+        start = time.perf_counter()
+        tracker.add_fix(atu_name, fix, x, y)
+        tracker.render(metrics.overlay() if args.overlay else None)
+        metrics.record("draw", start)
 
-        # If neither of names are found, skip to next data set.
-        else:
-            print("ATU name not recognized")
-            continue
-      
     # Close the serial port and the filestream.
+    metrics.close()
+    if server is not None:
+        server.stop()
     ser.close()
     output.close()
+    binary_output.close()
 
-    # Prompt user to exit.
-    input("Press enter to exit.")
+    # Prompt user to exit, leaving the plot up until then.
+    if not headless:
+        input("Press enter to exit.")
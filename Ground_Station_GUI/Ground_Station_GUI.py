@@ -1,175 +1,273 @@
-import matplotlib.pyplot as plt
-import sys
-import glob
+import argparse
 import serial
-import re
-import utm
 import math
+import signal
+import threading
+import time
+import gprmc
+import binlog
+import fix_server
+import landing_predictor
+from compressed_log import CompressedLogWriter
+from display import display_available
+from metrics import Metrics
+from serial_ports import choose_serial_port
+from serial_reader import SerialReader
 
-# Helper function for discovering serial ports.
-def find_serial_ports():
-    if sys.platform.startswith("win"):
-        ports = ["COM%s" % (i + 1) for i in range(256)]
-    elif sys.platform.startswith("linux") or sys.platform.startswith("cygwin"):
-        # This excludes your current terminal "/dev/tty".
-        ports = glob.glob("/dev/tty[A-Za-z]*")
-    elif sys.platform.startswith("darwin"):
-        ports = glob.glob("/dev/tty.*")
-    else:
-        raise EnvironmentError("Unsupported platform")
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
+# Number of times per second the plot is redrawn with whatever fixes have arrived. Without
+# a plot, fixes are still logged and published in batches this often.
+frame_rate = 10
+
+# Helper function for turning a raw serial record into a (line, gprmc.Fix) pair.
+# Returns None for records that can't be decoded or don't hold a locked fix, counting
+# why in metrics.
+def parse_line(ser_line, metrics):
+    # Try to decode the line, skip it if we can't.
+    start = time.perf_counter()
+    try:
+        cur_line = ser_line.decode("utf-8")
+    except UnicodeDecodeError:
+        metrics.count("undecodable")
+        return None
+    metrics.record("decode", start)
+
+    # Skip data sent while ATU is not locked.
+    if cur_line.endswith("0000.0000,N,00000.0000,E,000.0"):
+        metrics.count("not_locked")
+        return None
+
+    # Decode the sentence, skip it if it does not match the expected format or has no lock.
+    start = time.perf_counter()
+    fix = gprmc.parse_sentence(cur_line)
+    metrics.record("parse", start)
+    if fix is None:
+        metrics.count("unparsed")
+        return None
+    if not fix.valid:
+        metrics.count("not_locked")
+        return None
+
+    return cur_line, fix
 
 if __name__ == "__main__":
-    # Detername name of serial port.
-    ports = find_serial_ports()
-    if len(ports) == 0:
-        raise Exception("No serial ports found")
-    elif len(ports) > 1:
-        print("Multiple serial ports found: ", ports)
-        port_name = input("Enter the port you would like to use: ")
-        while port_name not in ports:
-            print("Error: not a port name")
-            port_name = input("Enter the port you would like to use: ")
-    else:
-        port_name = ports[0]
-
-    # Declare plot variables.
-    ydata, xdata = [0], [0]
-    text = None
-
-    # Create plot
-    fig, ax = plt.subplots()
-    line, = ax.plot(xdata, ydata)
-    plt.show(block=False)
-    fig.canvas.draw()
-
-    # Set to fullscreen.
-    mng = plt.get_current_fig_manager()
-    mng.window.state("zoomed")
-    plt.gca().set_aspect("equal", adjustable="box")
-    
-    # Set labels and create grid.
-    ax.set_title("Launch Vehicle Drift")
-    ax.set_xlabel("East (m)")
-    ax.set_ylabel("North (m)")
-    ax.grid(color="k", linestyle="-", linewidth=0.5)
-
-    # Regex for extracting latitude and longitude.
-    lat_pattern = re.compile(r"([0-9]{2})([0-9]{2}\.[0-9]+),(N|S)")
-    lon_pattern = re.compile(r"([0-9]{3})([0-9]{2}\.[0-9]+),(E|W)")
-
-    # Defines paramaters for distance/angle text box.
-    props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
-    
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Plot ATU drift live from the ground station radio.")
+    parser.add_argument("--overlay", action="store_true",
+                        help="show fix rate, age of the newest fix and error counts on the plot")
+    parser.add_argument("--metrics-log", default="metrics.log",
+                        help="file to append per-stage timings and counters to")
+    parser.add_argument("--output", default="output",
+                        help="base name of the session's logs, which get the start time appended")
+    parser.add_argument("--serve", type=int, nargs="?", const=fix_server.default_port, metavar="PORT",
+                        help="publish every fix for viewers started with fix_server.py to subscribe to")
+    parser.add_argument("--serve-host", default=fix_server.default_host,
+                        help="address to publish on (0.0.0.0 to let other machines subscribe)")
+    parser.add_argument("--descent-altitude", type=float, metavar="METERS",
+                        help="predict the landing footprint, starting from this height above the ground when the "
+                             "descent starts")
+    parser.add_argument("--descent-start", type=landing_predictor.time_of_day, metavar="HHMMSS",
+                        help="UTC time the descent starts at, if known; otherwise press \"{0}\" on the plot when it "
+                             "starts".format(landing_predictor.descent_key))
+    parser.add_argument("--descent-rate", type=float, default=landing_predictor.descent_rate, help="descent rate under canopy in m/s")
+    parser.add_argument("--headless", action="store_true",
+                        help="only log (and publish) fixes, without loading the plotting libraries; "
+                             "the default when there is no display")
+    args = parser.parse_args()
+
+    # Without a display there is nothing to plot on, so just log.
+    headless = args.headless
+    if not headless and not display_available():
+        print("No display found, running headless")
+        headless = True
+
+    # Detername name of serial port, reusing the last one if it is still there.
+    port_name = choose_serial_port()
+
+    # The plotting libraries take most of the startup time, so they are only loaded when
+    # there is a plot to draw.
+    if not headless:
+        import matplotlib.pyplot as plt
+        from plot_renderer import DriftRenderer, maximize
+        from projection import Projector
+        from track_buffer import TrackBuffer
+
+        # Declare plot variables, the track starts at the origin (0,0).
+        track = TrackBuffer()
+        track.append(0, 0)
+
+        # Create plot
+        fig, ax = plt.subplots()
+        line, = ax.plot(track.x, track.y)
+        plt.show(block=False)
+        fig.canvas.draw()
+
+        # Set to fullscreen.
+        maximize(fig)
+        ax.set_aspect("equal", adjustable="box")
+
+        # Set labels and create grid.
+        ax.set_title("Launch Vehicle Drift")
+        ax.set_xlabel("East (m)")
+        ax.set_ylabel("North (m)")
+        ax.grid(color="k", linestyle="-", linewidth=0.5)
+
+        # Defines paramaters for distance/angle text box.
+        props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
+
+        # Blit only the track and text on top of a cached background.
+        renderer = DriftRenderer(ax, line, props, fps=frame_rate)
+
     # Flag for whether or not the origin has been read.
     read_origin = False
 
-    # Opens a file named output.txt for writing the serial data to.
-    output = open("output.txt", "w")
+    # Projection from lat/lon to meters, set up from the first fix.
+    projector = None
+
+    # Landing footprint predictor, if the height of the descent was given and there is a
+    # plot to show it on.
+    predictor = None
+    if args.descent_altitude is not None and not headless:
+        predictor = landing_predictor.LandingPredictor(args.descent_altitude, args.descent_rate,
+                                                       descent_start=args.descent_start)
+        landing_predictor.bind_descent_key(fig, predictor)
+
+    # Starts a new compressed log session for the serial data (read back with
+    # compressed_log.py), and a .bin log of the same name for a compact binary copy of
+    # every fix. Earlier sessions are never overwritten.
+    output = CompressedLogWriter(args.output)
+    binary_output = binlog.BinaryLogWriter(output.session + ".bin")
+    print("Logging to " + output.session)
+    if headless:
+        print("Watch it with: python Ground_Station_GUI_no_serial.py {0} --follow".format(output.session))
 
     # Opens serial port at port_name with 9600 baud and 3 second timeout.
     ser = serial.Serial(port_name, 9600, timeout=30000)
 
-    while True:
-        # Read characters until we find the "@" delimiter.
-        while ser.read() != b"@":
-            pass
-
-        # Read a line of GPS data.
-        ser_line = ser.read(50)
-
-        # Try to decode the line, skip it if we can't.
-        try:
-            cur_line = ser_line.decode("utf-8")
-        except UnicodeDecodeError:
-            print("Could not decode serial data")
-            continue
-
-        # Skip data sent while ATU is not locked.
-        if cur_line.endswith("0000.0000,N,00000.0000,E,000.0"):
-            print("Sensor not locked")
-            continue
-
-        # Extract the latitude and convert to decimal degree form.
-        match = re.search(lat_pattern, cur_line)
-        if match is not None:
-            deg = float(match.group(1))
-            min = float(match.group(2))
-            lat = deg + (min / 60)
-            if str(match.group(3)) == "S":
-                lat = -lat
-
-        # If the data does not match the expected format, skip it.
-        else:
-            print("Latitude did not match expected regex format")
-            continue
-
-        # Extract the longitude and convert to decimal degree form.
-        match = re.search(lon_pattern, cur_line)
-        if match is not None:
-            deg = float(match.group(1))
-            min = float(match.group(2))
-            lon = deg + (min / 60)
-            if str(match.group(3)) == "W":
-                lon = -lon
-
-        # If the data does not match the expected format, skip it.
-        else:
-            print("Latitude did not match expected regex format")
-            continue
-
-        # If the data is valid and non-zero, print it to stdout and our output file.
-        print(cur_line)
-        output.write(cur_line + "\n")
-
-        # Convert lat/lon into UTM (standardized 2D cartesian projection).
-        x, y, _, _ = utm.from_latlon(lat, lon)
-
-        # Set first point as origin (0,0).
-        if not read_origin:
-            x_origin = x
-            y_origin = y
-            read_origin = True
-
-        # All other points are relative to this origin.
-        else:
-            x = x - x_origin
-            y = y - y_origin
-
-            # Add new data point
-            xdata.append(x)
-            ydata.append(y)
-            line.set_xdata(xdata)
-            line.set_ydata(ydata)
-
-            # Redraw plot and adjust axes.
-            ax.draw_artist(ax.patch)
-            ax.draw_artist(line)
-            ax.relim()
-            ax.autoscale_view()
-            fig.canvas.draw()
-            fig.canvas.flush_events()
+    # Time each stage of the pipeline and count records that are skipped.
+    metrics = Metrics(args.metrics_log)
+
+    # Publish fixes for other viewers on a background thread if asked to.
+    server = None
+    if args.serve is not None:
+        server = fix_server.FixServer(args.serve_host, args.serve)
+        server.start()
+        print("Publishing fixes on {0}:{1}".format(*server.address[:2]))
 
-            # Compute and print absolute distance and angle from origin.
+    # Start draining the serial port on a background thread.
+    reader = SerialReader(ser, lambda ser_line: parse_line(ser_line, metrics), metrics=metrics)
+    reader.start()
+
+    # Latest landing footprint, only predicted again when new fixes come in.
+    footprint = None
+
+    # Run until Ctrl-C, then fall through to closing everything so the last of the log
+    # makes it to disk.
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    while not stopping.is_set():
+        frame_start = time.monotonic()
+
+        # Take every fix that has arrived since the last frame, noting how many were queued
+        # up first, since draining empties the queue.
+        queue_depth = reader.queue_depth
+        fixes = reader.drain()
+        for arrival, (cur_line, fix) in fixes:
+            metrics.fix(arrival)
+
+            # If the data is valid and non-zero, print it to stdout and our output files.
+            print(cur_line)
+            start = time.perf_counter()
+            output.write(cur_line + "\n")
+            binary_output.write(fix)
+            metrics.record("write", start)
+
+            # Pass the fix on to any viewers.
+            if server is not None:
+                start = time.perf_counter()
+                server.publish(fix)
+                metrics.record("publish", start)
+
+            # Everything else is only for the plot.
+            if headless:
+                continue
+
+            # Convert lat/lon into UTM (standardized 2D cartesian projection), in the zone of the first fix.
+            start = time.perf_counter()
+            if projector is None:
+                projector = Projector(fix.lat, fix.lon)
+            x, y = projector.project(fix.lat, fix.lon)
+            metrics.record("utm", start)
+
+            # Set first point as origin (0,0).
+            if not read_origin:
+                x_origin = x
+                y_origin = y
+                x, y = 0.0, 0.0
+                read_origin = True
+
+            # All other points are relative to this origin.
+            else:
+                x = x - x_origin
+                y = y - y_origin
+
+                # Add new data point
+                track.append(x, y)
+
+            if predictor is not None:
+                predictor.add(fix.time, x, y)
+
+        metrics.set("dropped", reader.dropped)
+        metrics.set("framing_errors", reader.framing_errors)
+        metrics.set("log_dropped", output.dropped)
+
+        # Redraw once per frame if any new points were added, or every frame with the
+        # overlay so the age of the newest fix keeps counting up.
+        if not headless and len(track) > 1 and (len(fixes) > 0 or args.overlay):
+            # Compute and print absolute distance and angle from origin, and how far behind we are.
+            x, y = track.last()
             dist  = math.sqrt(x**2 + y**2)
             angle = math.degrees(math.atan2(y,x))
-            if text is not None:
-                text.remove()
             text_str = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
-            text = ax.text(0.05, 0.05, text_str, fontsize=12, transform=ax.transAxes, bbox=props)
-      
-    # Close serial port and file stream.
+            text_str += "\nQueued: {0}  Dropped: {1}  Framing errors: {2}".format(
+                queue_depth, reader.dropped, reader.framing_errors)
+            if args.overlay:
+                text_str += "\n" + metrics.overlay()
+
+            # Predict where it will land from the track so far. Frames redrawn only for the
+            # overlay keep the last footprint rather than drawing a new random sample.
+            if predictor is not None:
+                if len(fixes) > 0:
+                    start = time.perf_counter()
+                    footprint = predictor.predict()
+                    metrics.record("predict", start)
+                if footprint is not None:
+                    text_str += "\n" + landing_predictor.footprint_text(footprint)
+
+            # Redraw plot, adjusting axes only if the track or footprint left the view.
+            start = time.perf_counter()
+            renderer.update(track, text_str, footprint)
+            renderer.render(force=True)
+            metrics.record("draw", start)
+
+        # Keep the GUI responsive, log metrics now and then, and wait out the rest of the frame.
+        if not headless:
+            start = time.perf_counter()
+            fig.canvas.flush_events()
+            metrics.record("events", start)
+        metrics.maybe_write()
+        output.maybe_flush()
+        binary_output.maybe_flush()
+        time.sleep(max(0, 1 / frame_rate - (time.monotonic() - frame_start)))
+
+    # Stop the reader, close serial port and file stream.
+    reader.stop()
+    metrics.close()
+    if server is not None:
+        server.stop()
     output.close()
+    binary_output.close()
     ser.close()
 
-    # Prompt user to exit.
-    input("Press enter to exit.")
+    # Prompt user to exit, leaving the plot up until then.
+    if not headless:
+        input("Press enter to exit.")
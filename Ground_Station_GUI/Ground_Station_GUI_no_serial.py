@@ -1,151 +1,280 @@
-import matplotlib.pyplot as plt
-import sys
-import glob
-import serial
-import re
-import utm
+import argparse
 import math
+import time
+import numpy as np
+import gprmc
+import binlog
+import compressed_log
+import landing_predictor
+from metrics import Metrics
+from projection import Projector
+from track_buffer import TrackBuffer
+
+# Helper function for parsing every locked GPRMC record in a capture into NumPy arrays.
+# Returns the time of each fix in seconds since midnight and its latitude and longitude
+# in decimal degrees.
+def load_capture(file_name):
+    # Binary logs load straight into an array with no parsing.
+    if file_name.endswith(".bin"):
+        _, fixes = binlog.load(file_name)
+
+    # Compressed ground station logs are streamed back record by record.
+    elif compressed_log.is_compressed_log(file_name):
+        fixes = gprmc.parse_buffer(b"".join(compressed_log.read_records(file_name)))
+
+    # Otherwise read the whole capture at once and decode every record in it.
+    else:
+        with open(file_name, "rb") as filestream:
+            fixes = gprmc.parse_buffer(filestream.read())
+    fixes = fixes[fixes["valid"] != 0]
+    return fixes["time"], fixes["lat"], fixes["lon"]
+
+# Helper function for converting lat/lon arrays into UTM coordinates in a single pass.
+# Every point is projected into the zone of the first fix so the track stays continuous.
+def project_capture(lat, lon):
+    return Projector(lat[0], lon[0]).project(lat, lon)
+
+# Helper function for plotting a compressed log session live while it is still being
+# written, e.g. by a headless ground station, until its writer closes it or Ctrl-C. Returns
+# the time, latitude and longitude of every locked fix it saw, like load_capture.
+def follow_capture(file_name, renderer, metrics, predictor=None, overlay=False):
+    track = TrackBuffer()
+    projector = None
+    fix_time, lat, lon = [], [], []
+    footprint = None
+    last_prediction = 0
+
+    # Draw anything held back by the frame rate cap and keep the window responsive while
+    # waiting for the log to grow.
+    def idle(seconds):
+        renderer.render(force=True)
+        renderer.canvas.start_event_loop(seconds)
+
+    try:
+        for record in compressed_log.read_records(file_name, follow=True, pause=idle):
+            fix = gprmc.parse_sentence(record.decode("utf-8", "replace").strip())
+            if fix is None or not fix.valid:
+                continue
+            metrics.fix(time.perf_counter())
+            print(gprmc.format_fix(fix.time, fix.lat, fix.lon))
+            fix_time.append(fix.time)
+            lat.append(fix.lat)
+            lon.append(fix.lon)
+
+            # Convert lat/lon into UTM relative to the first fix, which is the origin (0,0).
+            start = time.perf_counter()
+            if projector is None:
+                projector = Projector(fix.lat, fix.lon)
+                x_origin, y_origin = projector.project(fix.lat, fix.lon)
+            x, y = projector.project(fix.lat, fix.lon)
+            x, y = x - x_origin, y - y_origin
+            metrics.record("utm", start)
+            track.append(x, y)
+
+            # Compute and print absolute distance and angle from origin.
+            dist  = math.sqrt(x**2 + y**2)
+            angle = math.degrees(math.atan2(y, x))
+            data_str = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
+            if overlay:
+                data_str += "\n" + metrics.overlay()
+
+            # Predict where it will land from the track so far, at most once per frame so a
+            # viewer that attached late catches up quickly.
+            if predictor is not None:
+                predictor.add(fix.time, x, y)
+                if time.monotonic() - last_prediction >= renderer.frame_interval:
+                    start = time.perf_counter()
+                    footprint = predictor.predict()
+                    metrics.record("predict", start)
+                    last_prediction = time.monotonic()
+                if footprint is not None:
+                    data_str += "\n" + landing_predictor.footprint_text(footprint)
+
+            # Redraw plot at most once per frame.
+            start = time.perf_counter()
+            renderer.update(track, data_str, footprint)
+            renderer.render()
+            metrics.record("draw", start)
+            metrics.maybe_write()
+    except KeyboardInterrupt:
+        pass
+    return np.array(fix_time), np.array(lat), np.array(lon)
 
 if __name__ == "__main__":
-    # Declare plot variables.
-    ydata = [0]
-    xdata = [0]
-    text = None
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Replay a recorded ATU capture.")
+    parser.add_argument("input_file", nargs="?",
+                        default="GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt",
+                        help="name of file to read data from (.txt capture, .bin log or compressed log session)")
+    parser.add_argument("--animate", action="store_true",
+                        help="redraw the plot after every fix instead of once at the end")
+    parser.add_argument("--follow", action="store_true",
+                        help="plot a compressed log session as it is being written (e.g. by a headless ground "
+                             "station) until it is closed, then show the whole track")
+    parser.add_argument("--overlay", action="store_true",
+                        help="show fix rate and age of the newest fix on the plot while animating")
+    parser.add_argument("--metrics-log", default="metrics.log",
+                        help="file to append per-stage timings and counters to")
+    parser.add_argument("--descent-altitude", type=float, metavar="METERS",
+                        help="predict the landing footprint, starting from this height above the ground when the "
+                             "descent starts")
+    parser.add_argument("--descent-start", type=landing_predictor.time_of_day, metavar="HHMMSS",
+                        help="UTC time the descent started at; when animating or following, pressing \"{0}\" "
+                             "starts it at the newest fix instead".format(landing_predictor.descent_key))
+    parser.add_argument("--descent-rate", type=float, default=landing_predictor.descent_rate,
+                        help="descent rate under canopy in m/s")
+    args = parser.parse_args()
+    if args.descent_altitude is not None and args.descent_start is None and not (args.animate or args.follow):
+        parser.error("--descent-altitude needs --descent-start unless animating or following")
+    if args.follow:
+        # The first file of a session only shows up once its first block has been written.
+        if not compressed_log.session_files(args.input_file):
+            print("Waiting for " + args.input_file)
+        elif not compressed_log.is_compressed_log(args.input_file):
+            parser.error("--follow needs a compressed log session, such as the one a ground station prints at startup")
+
+    # Only load the plotting libraries once there is a plot to draw, so load_capture and
+    # project_capture can be used without them.
+    import matplotlib.pyplot as plt
+    from plot_renderer import DriftRenderer, maximize
+
+    # Time each stage of the replay.
+    metrics = Metrics(args.metrics_log)
+
+    # Declare plot variables, the track starts at the origin (0,0).
+    track = TrackBuffer()
+    track.append(0, 0)
 
     # Create plot.
     fig, ax = plt.subplots()
-    line, = ax.plot(xdata, ydata)
+    line, = ax.plot(track.x, track.y)
     plt.show(block=False)
     fig.canvas.draw()
 
     # Set to fullscreen.
-    mng = plt.get_current_fig_manager()
-    mng.window.state("zoomed")
-    plt.gca().set_aspect("equal", adjustable="box")
-    
+    maximize(fig)
+    ax.set_aspect("equal", adjustable="box")
+
     # Set labels and create grid.
     ax.set_title("Launch Vehicle Drift")
     ax.set_xlabel("East (m)")
     ax.set_ylabel("North (m)")
     ax.grid(color="k", linestyle="-", linewidth=0.5)
 
-    # Regex for extracting time, latitude, and longitude.
-    time_pattern = re.compile(r"([0-9]{2})([0-9]{2})([0-9]{2}\.[0-9]{3}),A")
-    lat_pattern  = re.compile(r"([0-9]{2})([0-9]{2}\.[0-9]+),(N|S)")
-    lon_pattern  = re.compile(r"([0-9]{3})([0-9]{2}\.[0-9]+),(E|W)")
-
     # Defines paramaters for distance/angle text box.
     props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
 
-    # Flag for whether or not the origin has been read.
-    read_origin = False
+    # Blit only the track and text on top of a cached background.
+    renderer = DriftRenderer(ax, line, props)
 
-    # Opens a file named output.txt for writing GPS data to.
-    output = open("output.txt", "w")
+    # Plot the session live while it is being written, then carry on as if it had been
+    # loaded in one go once it is closed.
+    descent_start = args.descent_start
+    if args.follow:
+        live_predictor = None
+        if args.descent_altitude is not None:
+            live_predictor = landing_predictor.LandingPredictor(args.descent_altitude, args.descent_rate,
+                                                                descent_start=descent_start)
+            landing_predictor.bind_descent_key(fig, live_predictor)
+        fix_time, lat, lon = follow_capture(args.input_file, renderer, metrics, live_predictor, args.overlay)
+        if live_predictor is not None:
+            descent_start = live_predictor.start_time
 
-    # Name of file to read data from.
-    input_file = "GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt"
-    
-    with open(input_file, "r") as filestream:
-        while True:
-             # Read characters until we find the "@" delimiter.
-            c = filestream.read(1)
-            while c and c != "@":
-                c = filestream.read(1)
+    # Parse the whole capture and convert lat/lon into UTM (standardized 2D cartesian projection).
+    else:
+        start = time.perf_counter()
+        fix_time, lat, lon = load_capture(args.input_file)
+        metrics.record("parse", start)
+    if len(fix_time) == 0:
+        raise Exception("No locked GPS data found in " + args.input_file)
+    start = time.perf_counter()
+    x, y = project_capture(lat, lon)
+    metrics.record("utm", start)
 
-            # Break at end of file.
-            if not c:
-                break
+    # Write time, latitude, and longitude to a file named output.txt.
+    start = time.perf_counter()
+    lines = [gprmc.format_fix(t, la, lo) for t, la, lo in zip(fix_time, lat, lon)]
+    with open("output.txt", "w") as output:
+        output.write("\n".join(lines) + "\n")
+    metrics.record("write", start)
 
-            # Read a line of GPS data.
-            cur_line = filestream.read(50)
+    # Set first point as origin (0,0), all other points are relative to this origin.
+    x = x - x[0]
+    y = y - y[0]
 
-            # Skip data sent while ATU is not locked.
-            if cur_line.endswith("0000.0000,N,00000.0000,E,000.0"):
-                continue
+    # Landing footprint predictor, if the height of the descent was given.
+    predictor = None
+    footprint = None
+    if args.descent_altitude is not None:
+        predictor = landing_predictor.LandingPredictor(args.descent_altitude, args.descent_rate,
+                                                       descent_start=descent_start)
 
-            # Extract the time and break into hours, minutes, seconds.
-            match = re.search(time_pattern, cur_line)
-            if match is not None:
-                hour   = int(match.group(1))
-                minute = int(match.group(2))
-                second = float(match.group(3))
+    if args.animate and not args.follow:
+        # Start the track at the origin; the rest of it is added fix by fix below.
+        if predictor is not None:
+            predictor.add(fix_time[0], x[0], y[0])
+            landing_predictor.bind_descent_key(fig, predictor)
 
-            # If the data does not match the expected format, skip it.
-            else:
-                continue
+        for i in range(1, len(x)):
+            metrics.fix(time.perf_counter())
+            print(lines[i])
 
-            # Extract the latitude and convert to decimal degree form.
-            match = re.search(lat_pattern, cur_line)
-            if match is not None:
-                deg = float(match.group(1))
-                min = float(match.group(2))
-                lat = deg + (min / 60)
-                if str(match.group(3)) == "S":
-                    lat = -lat
-
-            # If the data does not match the expected format, skip it.
-            else:
-                continue
+            # Add new data point.
+            track.append(x[i], y[i])
 
-            # Extract the longitude and convert to decimal degree form.
-            match = re.search(lon_pattern, cur_line)
-            if match is not None:
-                deg = float(match.group(1))
-                min = float(match.group(2))
-                lon = deg + (min / 60)
-                if str(match.group(3)) == "W":
-                    lon = -lon
-
-            # If the data does not match the expected format, skip it.
-            else:
-                continue
+            # Compute and print absolute distance and angle from origin.
+            dist  = math.sqrt(x[i]**2 + y[i]**2)
+            angle = math.degrees(math.atan2(y[i], x[i]))
+            data_str = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
+            if args.overlay:
+                data_str += "\n" + metrics.overlay()
+
+            # Predict where it will land from the track so far.
+            if predictor is not None:
+                start = time.perf_counter()
+                predictor.add(fix_time[i], x[i], y[i])
+                footprint = predictor.predict()
+                metrics.record("predict", start)
+                if footprint is not None:
+                    data_str += "\n" + landing_predictor.footprint_text(footprint)
+
+            # Redraw plot at most once per frame, adjusting axes only if the track or
+            # footprint left the view.
+            start = time.perf_counter()
+            renderer.update(track, data_str, footprint)
+            renderer.render()
+            metrics.record("draw", start)
+            metrics.maybe_write()
+
+    else:
+        # Hand the whole track to the plot at once.
+        track.extend(x[1:], y[1:])
+        metrics.count("fixes", len(x) - 1)
+
+        # Predict from the end of the track only, which includes the first fix if the
+        # capture is shorter than the drift window.
+        if predictor is not None:
+            recent = fix_time >= fix_time[-1] - landing_predictor.drift_window
+            for t, x_i, y_i in zip(fix_time[recent], x[recent], y[recent]):
+                predictor.add(t, x_i, y_i)
+            footprint = predictor.predict()
+
+    # Compute and print absolute distance and angle of the last fix from origin.
+    dist  = math.sqrt(x[-1]**2 + y[-1]**2)
+    angle = math.degrees(math.atan2(y[-1], x[-1]))
+    data_str = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
+    if footprint is not None:
+        data_str += "\n" + landing_predictor.footprint_text(footprint)
+    print("Replayed {0} fixes".format(len(x)))
+
+    # Draw whatever is left over from the last frame.
+    start = time.perf_counter()
+    renderer.update(track, data_str, footprint)
+    renderer.render(force=True)
+    metrics.record("draw", start)
+    metrics.close()
 
-            # Write time, latitude, and longitude to stdout and output file.
-            second_str = "{0:.3f}".format(second).zfill(6)
-            output_str = "{0:02d}:{1:02d}:{2} -> {3:.4f}, {4:.4f}"
-            output.write(output_str.format(hour, minute, second_str, lat, lon) + "\n")
-            print(output_str.format(hour, minute, second_str, lat, lon))
-
-            # Convert lat/lon into UTM (standardized 2D cartesian projection).
-            x, y, _, _ = utm.from_latlon(lat, lon)
-
-            # Set first point as origin (0,0).
-            if not read_origin:
-                x_origin = x
-                y_origin = y
-                read_origin = True
-
-            # All other points are relative to this origin.
-            else:
-                x = x - x_origin
-                y = y - y_origin
-
-                # Add new data point.
-                xdata.append(x)
-                ydata.append(y)
-                line.set_xdata(xdata)
-                line.set_ydata(ydata)
-
-                # Redraw plot and adjust axes.
-                ax.draw_artist(ax.patch)
-                ax.draw_artist(line)
-                ax.relim()
-                ax.autoscale_view()
-                fig.canvas.draw()
-                fig.canvas.flush_events()
-
-                # Compute and print absolute distance and angle from origin.
-                dist  = math.sqrt(x**2 + y**2)
-                angle = math.degrees(math.atan2(y,x))
-                if text is not None:
-                    text.remove()
-                data_str = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\circ$".format(dist, angle)
-                text = ax.text(0.05, 0.05, data_str, fontsize=12, transform=ax.transAxes, bbox=props)
-        
-    # Close the output file.
-    output.close()
-        
-    # Prompt user to save the figure.
+    # Prompt user to save the figure, with every point of the track.
     file_name = input("Save figure as: ")
+    renderer.full_resolution()
     plt.savefig(file_name)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import math
+import os
+import re
+import time
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import binlog
+import gprmc
+from projection import Projector
+
+# File types picked up when a directory is given.
+capture_extensions = (".txt", ".bin")
+
+# Regex for a line of a ground station output.txt (HH:MM:SS.sss -> lat, lon), with the
+# ATU name in front when it came from the two-ATU ground station.
+output_pattern = re.compile(rb"^(?:(\w+): *)?([0-9]{2}):([0-9]{2}):([0-9]{2}\.[0-9]+) -> (-?[0-9.]+), (-?[0-9.]+)", re.M)
+
+# Gaps between locked fixes longer than this many seconds count as dropouts. The ATUs
+# send 10 fixes per second.
+dropout_gap = 1.0
+
+# Helper function for working out what kind of capture a file holds: "binary" (binlog),
+# "multi" (raw records tagged ?,name), "raw" (raw $GPRMC records), "output" (output.txt
+# lines), or None.
+def detect_format(data):
+    if data.startswith(binlog.magic):
+        return "binary"
+    head = data[:4096]
+    if b"$GPRMC" in head:
+        return "multi" if b"?," in head else "raw"
+    if output_pattern.search(head):
+        return "output"
+    return None
+
+# Helper function for loading every record in a capture, whatever its format. Returns a
+# dict of ATU name to a NumPy array with gprmc.fix_dtype, in the order received. Single
+# ATU captures use the name "".
+def load_flight(file_name):
+    with open(file_name, "rb") as filestream:
+        data = filestream.read()
+    capture_format = detect_format(data)
+
+    if capture_format == "binary":
+        names, records = binlog.load(file_name)
+        flight = {}
+        for atu in np.unique(records["atu"]):
+            unit = records[records["atu"] == atu]
+            fixes = np.zeros(len(unit), dtype=gprmc.fix_dtype)
+            for field in gprmc.fix_dtype.names:
+                fixes[field] = unit[field]
+            flight[names[atu] if atu < len(names) else str(atu)] = fixes
+        return capture_format, flight
+
+    if capture_format == "raw":
+        return capture_format, {"": gprmc.parse_buffer(data)}
+
+    # Multi-ATU captures tag each record with a name (<GPS data>?,<name>@).
+    if capture_format == "multi":
+        units = {}
+        for record in data.split(b"@"):
+            cur_line, _, atu_name = record.rpartition(b"?,")
+            fix = gprmc.parse_sentence(cur_line)
+            if fix is None or not atu_name.isalnum():
+                continue
+            units.setdefault(atu_name.decode("ascii"), []).append(tuple(fix))
+        return capture_format, {name: np.array(fixes, dtype=gprmc.fix_dtype) for name, fixes in units.items()}
+
+    # Output files only hold locked fixes.
+    if capture_format == "output":
+        units = {}
+        for name, hour, minute, second, lat, lon in output_pattern.findall(data):
+            fix_time = int(hour) * 3600 + int(minute) * 60 + float(second)
+            units.setdefault(name.decode("ascii"), []).append((fix_time, True, float(lat), float(lon), np.nan))
+        return capture_format, {name: np.array(fixes, dtype=gprmc.fix_dtype) for name, fixes in units.items()}
+
+    raise ValueError(file_name + " is not a recognized capture format")
+
+# Helper function for formatting seconds since midnight as HH:MM:SS.sss.
+def format_time(seconds):
+    hour, rem = divmod(seconds, 3600)
+    minute, second = divmod(rem, 60)
+    return "{0:02d}:{1:02d}:{2:06.3f}".format(int(hour), int(minute), second)
+
+# Helper function for the seconds between fix times, allowing for a capture that runs past midnight.
+def time_steps(times):
+    steps = np.diff(times)
+    steps[steps < -43200] += 86400
+    return steps
+
+# Drift summary of one ATU's records. The origin is the first locked fix, as on the
+# ground station, and the track is returned in meters east/north of it.
+def summarize(fixes, gap=dropout_gap):
+    summary = {"records": len(fixes), "fixes": int(np.count_nonzero(fixes["valid"]))}
+    locked = fixes[fixes["valid"]]
+    if len(locked) == 0:
+        return summary, None
+
+    x, y = Projector(locked["lat"][0], locked["lon"][0]).project(locked["lat"], locked["lon"])
+    x, y = x - x[0], y - y[0]
+    distance = np.hypot(x, y)
+
+    # Dropouts are long gaps between consecutive locked fixes.
+    steps = time_steps(locked["time"])
+    gaps = np.flatnonzero(steps > gap)
+
+    summary.update({
+        "start": format_time(locked["time"][0]),
+        "end": format_time(locked["time"][-1]),
+        "duration_s": float(np.sum(steps)),
+        "lock_acquisition_s": float(np.sum(time_steps(fixes["time"][:np.argmax(fixes["valid"]) + 1]))),
+        "max_distance_m": float(distance.max()),
+        "final_distance_m": float(distance[-1]),
+        # Compass bearing of the last fix from the origin, clockwise from north.
+        "final_bearing_deg": math.degrees(math.atan2(x[-1], y[-1])) % 360,
+        "dropouts": [{"start": format_time(locked["time"][i]), "length_s": float(steps[i])} for i in gaps],
+        "longest_dropout_s": float(steps[gaps].max()) if len(gaps) else 0.0,
+    })
+    return summary, (x, y)
+
+# Process one capture: summarize every ATU in it and save a drift plot of each, side by
+# side, as figure_name. Returns a list of summaries, one per ATU.
+def process(file_name, figure_name, gap=dropout_gap):
+    start = time.perf_counter()
+    capture_format, flight = load_flight(file_name)
+    summaries = []
+    tracks = []
+    for name, fixes in sorted(flight.items()):
+        summary, track = summarize(fixes, gap)
+        summary.update({"file": file_name, "format": capture_format, "atu": name})
+        summaries.append(summary)
+        if track is not None:
+            tracks.append((name, summary, track))
+
+    # One subplot per ATU with a locked fix, laid out in a row.
+    if len(tracks) > 0:
+        fig, axes = plt.subplots(1, len(tracks), figsize=(6 * len(tracks), 6), squeeze=False)
+        props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
+        for ax, (name, summary, (x, y)) in zip(axes[0], tracks):
+            ax.plot(x, y)
+            ax.plot(x[-1], y[-1], "o")
+            ax.set_title("Launch Vehicle Drift ({0})".format(name.capitalize()) if name else "Launch Vehicle Drift")
+            ax.set_xlabel("East (m)")
+            ax.set_ylabel("North (m)")
+            ax.grid(color="k", linestyle="-", linewidth=0.5)
+            ax.set_aspect("equal", adjustable="datalim")
+            text = "Max distance: {0:.2f} m\nFinal distance: {1:.2f} m\nFinal bearing: {2:.1f}$^\\circ$".format(
+                summary["max_distance_m"], summary["final_distance_m"], summary["final_bearing_deg"])
+            ax.text(0.05, 0.05, text, fontsize=10, transform=ax.transAxes, bbox=props)
+
+        fig.savefig(figure_name)
+        plt.close(fig)
+        for _, summary, _ in tracks:
+            summary["figure"] = figure_name
+
+    for summary in summaries:
+        summary["processing_s"] = time.perf_counter() - start
+    return summaries
+
+# Helper function for expanding files and directories into the list of captures to process.
+def find_captures(paths):
+    captures = []
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in capture_extensions:
+                captures += glob.glob(os.path.join(path, "**", "*" + extension), recursive=True)
+        else:
+            captures.append(path)
+    return sorted(set(captures))
+
+# Helper function for naming each capture's figure after its path below the folder all the
+# captures share, so captures with the same file name in different folders (every flight's
+# output.txt) each get their own. The extension is kept in the name too, since a capture
+# is often archived as both .txt and .bin.
+def figure_names(captures, output_dir):
+    paths = [os.path.abspath(capture) for capture in captures]
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    except ValueError:
+        # Captures on different Windows drives share no folder, so name them from the top.
+        root = ""
+    names = {}
+    for capture, path in zip(captures, paths):
+        relative = os.path.relpath(path, root) if root else path.replace(":", "")
+        name = relative.replace(os.sep, "_").replace("/", "_").replace(".", "_") + ".png"
+        names[capture] = os.path.join(output_dir, name)
+    return names
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Summarize and plot a whole archive of flight captures.")
+    parser.add_argument("paths", nargs="+", help="capture files or directories of them")
+    parser.add_argument("--output-dir", default="batch_output", help="directory to write figures and the summary to")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--gap", type=float, default=dropout_gap,
+                        help="seconds between locked fixes that count as a dropout")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    captures = find_captures(args.paths)
+    figures = figure_names(captures, args.output_dir)
+    start = time.perf_counter()
+
+    # Each capture is processed in its own worker process. One that can't be read is
+    # reported and doesn't stop the rest.
+    summaries = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(process, capture, figures[capture], args.gap): capture for capture in captures}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                summaries += future.result()
+            except Exception as error:
+                print("Skipping {0}: {1}".format(futures[future], error))
+
+    summaries.sort(key=lambda summary: (summary["file"], summary["atu"]))
+    with open(os.path.join(args.output_dir, "summary.json"), "w") as output:
+        json.dump(summaries, output, indent=2)
+
+    print("{0:<52} {1:<8} {2:>7} {3:>9} {4:>9} {5:>8} {6:>8}".format(
+        "capture", "atu", "fixes", "max m", "bearing", "lock s", "dropouts"))
+    for summary in summaries:
+        if summary["fixes"] == 0:
+            print("{0:<52} {1:<8} {2:>7} (never locked)".format(
+                os.path.basename(summary["file"]), summary["atu"], 0))
+            continue
+        print("{0:<52} {1:<8} {2:>7} {3:>9.1f} {4:>9.1f} {5:>8.1f} {6:>8}".format(
+            os.path.basename(summary["file"]), summary["atu"], summary["fixes"], summary["max_distance_m"],
+            summary["final_bearing_deg"], summary["lock_acquisition_s"], len(summary["dropouts"])))
+    print("Processed {0} captures in {1:.2f} s".format(len(captures), time.perf_counter() - start))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing
+import socket
+import time
+import numpy as np
+import gprmc
+from fix_server import FixServer, FixSubscriber
+
+# Capture the published fixes are taken from, repeated as needed.
+input_file = "GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt"
+
+# Rate the ATUs actually send fixes at, in Hz.
+real_rate = 10
+
+# Multiples of the real rate fixes are published at.
+rate_multipliers = [1, 10, 100]
+
+# A subscriber in its own process, like a viewer on the same machine would be. Reads
+# until the server goes away, then puts how many fixes it received, how many it missed
+# and how late each one arrived on results.
+def timed_subscriber(port, results):
+    subscriber = FixSubscriber("127.0.0.1", port)
+    latencies = []
+    try:
+        for _, _, _, sent in subscriber:
+            latencies.append(time.time() - sent)
+    except (OSError, ValueError):
+        pass
+    results.put((subscriber.received, subscriber.missed, latencies))
+
+# Helper function for a subscriber that connects and then never reads, with a receive
+# buffer small enough that it fills up quickly.
+def stuck_subscriber(port):
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(("127.0.0.1", port))
+    return sock
+
+# Publish fixes at rate per second for duration seconds to a number of healthy
+# subscribers and stuck ones that never read, and collect what each of them received.
+def run_scenario(fixes, rate, duration, subscribers, stuck):
+    server = FixServer("127.0.0.1", 0, stall_timeout=min(5.0, duration / 2))
+    server.start()
+    port = server.address[1]
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=timed_subscriber, args=(port, results), daemon=True)
+               for _ in range(subscribers)]
+    for client in clients:
+        client.start()
+    stuck_socks = [stuck_subscriber(port) for _ in range(stuck)]
+    while server.subscriber_count < subscribers + stuck:
+        time.sleep(0.01)
+
+    # Publish on a fixed schedule, timing each publish() as the ingest loop would see it.
+    count = int(rate * duration)
+    costs = np.empty(count)
+    start = time.monotonic()
+    for i in range(count):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        begin = time.perf_counter()
+        server.publish(fixes[i % len(fixes)])
+        costs[i] = time.perf_counter() - begin
+    elapsed = time.monotonic() - start
+
+    # Give the last fixes a moment to arrive, then shut everything down.
+    time.sleep(0.5)
+    still_connected = server.subscriber_count
+    server.stop()
+    received, missed, latencies = zip(*[results.get(timeout=10) for _ in clients])
+    for client in clients:
+        client.join()
+    for sock in stuck_socks:
+        sock.close()
+    latencies = np.concatenate(latencies)
+    return {
+        "rate_hz": rate,
+        "published": count,
+        "achieved_hz": count / elapsed,
+        "publish_mean_us": costs.mean() * 1e6,
+        "publish_p99_us": np.percentile(costs, 99) * 1e6,
+        "publish_max_us": costs.max() * 1e6,
+        "subscribers": subscribers,
+        "min_received": min(received),
+        "max_missed": max(missed),
+        "latency_p50_ms": np.percentile(latencies, 50) * 1000,
+        "latency_p99_ms": np.percentile(latencies, 99) * 1000,
+        "latency_max_ms": latencies.max() * 1000,
+        "stuck": stuck,
+        "skipped_for_slow_clients": server.skipped,
+        "slow_clients_disconnected": server.disconnected,
+        "connected_at_end": still_connected,
+        "queue_overflows": server.overflowed,
+    }
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Loopback test of publishing fixes to many subscribers.")
+    parser.add_argument("--subscribers", type=int, default=20, help="number of subscribers that keep up")
+    parser.add_argument("--stuck", type=int, default=2, help="number of subscribers that never read")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to publish for at each rate")
+    parser.add_argument("--output", default="bench_fix_server.json", help="file to write machine-readable results to")
+    args = parser.parse_args()
+
+    with open(input_file, "rb") as filestream:
+        data = gprmc.parse_buffer(filestream.read())
+    fixes = [gprmc.Fix(float(fix["time"]), bool(fix["valid"]), float(fix["lat"]), float(fix["lon"]),
+                       float(fix["speed"])) for fix in data]
+
+    results = []
+    for multiplier in rate_multipliers:
+        result = run_scenario(fixes, real_rate * multiplier, args.duration, args.subscribers, args.stuck)
+        results.append(result)
+        print("%5d Hz: %d fixes to %d subscribers, every one received >= %d (missed <= %d)" % (
+            result["rate_hz"], result["published"], result["subscribers"], result["min_received"],
+            result["max_missed"]))
+        print("         publish %.1f us mean, %.1f us p99; latency %.2f ms p50, %.2f ms p99, %.2f ms max" % (
+            result["publish_mean_us"], result["publish_p99_us"], result["latency_p50_ms"],
+            result["latency_p99_ms"], result["latency_max_ms"]))
+        print("         %d stuck subscribers: %d fixes skipped, %d disconnected" % (
+            result["stuck"], result["skipped_for_slow_clients"], result["slow_clients_disconnected"]))
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print("Results written to " + args.output)
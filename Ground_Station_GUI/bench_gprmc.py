@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import re
+import timeit
+import gprmc
+
+# Bundled captures to benchmark against.
+input_files = ["GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt",
+               "outputReal_gndStation_1MileTrack.txt",
+               "twoATU_exampleData.txt",
+               "example_data.txt"]
+
+# Regex for extracting time, latitude, and longitude the way the GUI scripts used to.
+time_pattern = re.compile(r"([0-9]{2})([0-9]{2})([0-9]{2}\.[0-9]{3}),A")
+lat_pattern  = re.compile(r"([0-9]{2})([0-9]{2}\.[0-9]+),(N|S)")
+lon_pattern  = re.compile(r"([0-9]{3})([0-9]{2}\.[0-9]+),(E|W)")
+
+# Helper function reproducing the old three-regex parse of a single record.
+def parse_regex(cur_line):
+    match = re.search(time_pattern, cur_line)
+    if match is None:
+        return None
+    time = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+
+    match = re.search(lat_pattern, cur_line)
+    if match is None:
+        return None
+    lat = float(match.group(1)) + float(match.group(2)) / 60
+    if str(match.group(3)) == "S":
+        lat = -lat
+
+    match = re.search(lon_pattern, cur_line)
+    if match is None:
+        return None
+    lon = float(match.group(1)) + float(match.group(2)) / 60
+    if str(match.group(3)) == "W":
+        lon = -lon
+
+    return time, lat, lon
+
+# Helper function for splitting a capture into individual records, however they are delimited.
+def split_records(data):
+    records = re.split(r"[@\n]|(?=\$)", data)
+    return [r for r in records if r.startswith("$GPRMC")]
+
+# Helper function for timing a statement, returning the best time per call in seconds.
+def best_time(func, repeat=5):
+    number = 1
+    while timeit.timeit(func, number=number) < 0.2:
+        number *= 2
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+if __name__ == "__main__":
+    print("{0:<52} {1:>7} {2:>12} {3:>12} {4:>12}".format(
+        "file", "records", "regex us/rec", "scalar us/rec", "batch us/rec"))
+
+    for input_file in input_files:
+        with open(input_file, "rb") as filestream:
+            data = filestream.read()
+        records = split_records(data.decode("ascii"))
+
+        regex_time  = best_time(lambda: [parse_regex(r) for r in records])
+        scalar_time = best_time(lambda: [gprmc.parse_sentence(r) for r in records])
+        batch_time  = best_time(lambda: gprmc.parse_buffer(data))
+
+        n = len(records)
+        print("{0:<52} {1:>7} {2:>12.2f} {3:>12.2f} {4:>12.2f}".format(
+            input_file, n, regex_time / n * 1e6, scalar_time / n * 1e6, batch_time / n * 1e6))
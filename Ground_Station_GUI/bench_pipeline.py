@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import gprmc
+from framer import RecordFramer
+from plot_renderer import DriftRenderer
+from projection import Projector
+from track_buffer import TrackBuffer
+
+# Bundled captures, replayed as fast as the pipeline will take them.
+input_files = ["GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt",
+               "twoATU_exampleData.txt",
+               "outputReal_gndStation_1MileTrack.txt"]
+
+# Rate the ATUs actually send fixes at, in Hz.
+real_rate = 10
+
+# Multiples of the real rate the synthetic streams are paced at.
+rate_multipliers = [10, 100, 1000]
+
+# Frame rate cap for the renderer, as in the live ground station.
+frame_rate = 30
+
+# Helper function for the resident memory of this process in KB, or None if unknown.
+def resident_kb():
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# A record and the delimiter after it, as the radio delivers them.
+chunk_pattern = re.compile(rb"\$[^$@\r\n]*[@\r\n]?")
+
+# Helper function for splitting a capture into the byte chunks the radio would deliver,
+# one record per chunk. Anything between records stays in the chunk before it.
+def split_chunks(data):
+    ends = [match.end() for match in chunk_pattern.finditer(data)]
+    starts = [0] + ends[:-1]
+    return [data[start:end] for start, end in zip(starts, ends)]
+
+# Helper function for a synthetic stream of num_fixes records taken from a real capture,
+# repeated as many times as needed.
+def synthetic_chunks(data, num_fixes):
+    chunks = [chunk for chunk in split_chunks(data) if b",A," in chunk]
+    repeats = num_fixes // len(chunks) + 1
+    return (chunks * repeats)[:num_fixes]
+
+# Runs the whole ground station pipeline headless: framing, GPRMC parsing, projection,
+# track update and render. Chunks are delivered at rate per second, or as fast as
+# possible if rate is None. Latency is measured per fix from when its bytes arrive to
+# when a frame containing it has been drawn.
+class Pipeline:
+    def __init__(self):
+        self.fig, self.ax = plt.subplots()
+        self.ax.set_aspect("equal", adjustable="box")
+        self.track = TrackBuffer()
+        self.track.append(0, 0)
+        line, = self.ax.plot(self.track.x, self.track.y)
+        props = dict(boxstyle="square", facecolor="aliceblue", alpha=0.5)
+        self.renderer = DriftRenderer(self.ax, line, props, fps=frame_rate)
+        self.framer = RecordFramer()
+        self.projector = None
+        self.origin = None
+
+    def close(self):
+        plt.close(self.fig)
+
+    # Push one fix through projection and the track, returning True if it was plotted.
+    def add_record(self, record):
+        fix = gprmc.parse_sentence(record)
+        if fix is None or not fix.valid:
+            return False
+        if self.projector is None:
+            self.projector = Projector(fix.lat, fix.lon)
+        x, y = self.projector.project(fix.lat, fix.lon)
+        if self.origin is None:
+            self.origin = (x, y)
+            return False
+        self.track.append(x - self.origin[0], y - self.origin[1])
+        text = "Distance: {0:.2f} m".format(np.hypot(x - self.origin[0], y - self.origin[1]))
+        self.renderer.update(self.track, text)
+        return True
+
+    def run(self, chunks, rate=None):
+        latencies = []
+        pending = []
+        records = 0
+        memory_before = resident_kb()
+        start = time.perf_counter()
+
+        i = 0
+        while i < len(chunks):
+            now = time.perf_counter()
+
+            # Take every chunk that has "arrived" by now, or just the next one if unpaced.
+            if rate is None:
+                arrived = [(now, chunks[i])]
+                i += 1
+            else:
+                arrived = []
+                while i < len(chunks) and start + i / rate <= now:
+                    arrived.append((start + i / rate, chunks[i]))
+                    i += 1
+                if len(arrived) == 0:
+                    time.sleep(max(0, start + i / rate - now))
+                    continue
+
+            for arrival, chunk in arrived:
+                for record in self.framer.feed(chunk):
+                    records += 1
+                    if self.add_record(record):
+                        pending.append(arrival)
+
+            # Every fix waiting on the screen is shown once a frame is drawn.
+            if self.renderer.render():
+                drawn = time.perf_counter()
+                latencies.extend(drawn - arrival for arrival in pending)
+                pending = []
+
+        if self.renderer.render(force=True):
+            drawn = time.perf_counter()
+            latencies.extend(drawn - arrival for arrival in pending)
+
+        elapsed = time.perf_counter() - start
+        memory_after = resident_kb()
+        latencies = np.array(latencies) * 1000
+        return {
+            "records": records,
+            "fixes": len(latencies),
+            "seconds": elapsed,
+            "records_per_s": records / elapsed,
+            "fixes_per_s": len(latencies) / elapsed,
+            "p50_latency_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_latency_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "memory_growth_kb": (memory_after - memory_before) if memory_before is not None else None,
+            "framing_errors": self.framer.framing_errors,
+        }
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Benchmark the ground station pipeline headless.")
+    parser.add_argument("--duration", type=float, default=3.0,
+                        help="seconds each synthetic stream runs for")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="file to write machine-readable results to")
+    args = parser.parse_args()
+
+    results = []
+
+    # Replay each bundled capture as fast as the pipeline will go.
+    for input_file in input_files:
+        with open(input_file, "rb") as filestream:
+            data = filestream.read()
+        pipeline = Pipeline()
+        result = pipeline.run(split_chunks(data))
+        pipeline.close()
+        result["name"] = input_file
+        result["rate"] = None
+        results.append(result)
+
+    # Synthetic streams paced at multiples of the real fix rate.
+    with open(input_files[0], "rb") as filestream:
+        data = filestream.read()
+    for multiplier in rate_multipliers:
+        rate = real_rate * multiplier
+        pipeline = Pipeline()
+        result = pipeline.run(synthetic_chunks(data, int(rate * args.duration)), rate)
+        pipeline.close()
+        result["name"] = "synthetic {0}x".format(multiplier)
+        result["rate"] = rate
+        results.append(result)
+
+    print("{0:<52} {1:>8} {2:>10} {3:>9} {4:>9} {5:>9}".format(
+        "stream", "fixes", "fixes/s", "p50 ms", "p99 ms", "mem KB"))
+    for result in results:
+        print("{0:<52} {1:>8} {2:>10.0f} {3:>9} {4:>9} {5:>9}".format(
+            result["name"], result["fixes"], result["fixes_per_s"],
+            "-" if result["p50_latency_ms"] is None else "{0:.2f}".format(result["p50_latency_ms"]),
+            "-" if result["p99_latency_ms"] is None else "{0:.2f}".format(result["p99_latency_ms"]),
+            "-" if result["memory_growth_kb"] is None else result["memory_growth_kb"]))
+
+    # Write the results with enough context to compare runs between versions.
+    with open(args.output, "w") as output:
+        json.dump({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "results": results,
+        }, output, indent=2)
+    print("Results written to " + args.output)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import timeit
+import numpy as np
+import utm
+import gprmc
+from projection import Projector
+
+# Bundled tracks to validate against.
+input_files = ["outputReal_gndStation_1MileTrack.txt",
+               "GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt"]
+
+# Helper function for timing a statement, returning the best time per call in seconds.
+def best_time(func, repeat=5):
+    number = 1
+    while timeit.timeit(func, number=number) < 0.2:
+        number *= 2
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+if __name__ == "__main__":
+    for input_file in input_files:
+        with open(input_file, "rb") as filestream:
+            fixes = gprmc.parse_buffer(filestream.read())
+        fixes = fixes[fixes["valid"]]
+        lat, lon = fixes["lat"], fixes["lon"]
+        lat_list, lon_list = lat.tolist(), lon.tolist()
+        n = len(fixes)
+
+        # Reference positions from the utm package, relative to the first fix.
+        ref_x, ref_y, zone_number, zone_letter = utm.from_latlon(lat, lon)
+        ref_x, ref_y = ref_x - ref_x[0], ref_y - ref_y[0]
+
+        print(input_file)
+        print("  {0} fixes in zone {1}{2}".format(n, zone_number, zone_letter))
+
+        # ENU is aligned with true north rather than the UTM grid, so over a few km it differs
+        # from UTM by the grid convergence and scale factor, not by any projection error.
+        for method in ("utm", "enu"):
+            projector = Projector(lat[0], lon[0], method)
+
+            # Check the array path, and that the scalar path agrees with it.
+            x, y = projector.project(lat, lon)
+            x, y = x - x[0], y - y[0]
+            scalar = np.array([projector.project(la, lo) for la, lo in zip(lat_list, lon_list)])
+            scalar -= scalar[0]
+            error = np.hypot(x - ref_x, y - ref_y).max()
+            scalar_error = np.hypot(scalar[:, 0] - x, scalar[:, 1] - y).max()
+            extent = np.hypot(ref_x, ref_y).max()
+            print("  {0}: max difference from utm.from_latlon {1:.2e} m over {2:.0f} m "
+                  "(scalar vs array {3:.2e} m)".format(method, error, extent, scalar_error))
+
+        # Per-fix cost of each way of projecting the track.
+        projector = Projector(lat[0], lon[0])
+        enu_projector = Projector(lat[0], lon[0], "enu")
+        timings = [
+            ("utm.from_latlon scalar", lambda: [utm.from_latlon(la, lo) for la, lo in zip(lat_list, lon_list)]),
+            ("utm.from_latlon array", lambda: utm.from_latlon(lat, lon, zone_number, zone_letter)),
+            ("Projector utm scalar", lambda: [projector.project(la, lo) for la, lo in zip(lat_list, lon_list)]),
+            ("Projector utm array", lambda: projector.project(lat, lon)),
+            ("Projector enu scalar", lambda: [enu_projector.project(la, lo) for la, lo in zip(lat_list, lon_list)]),
+            ("Projector enu array", lambda: enu_projector.project(lat, lon)),
+        ]
+        for name, func in timings:
+            print("  {0:<24} {1:8.3f} us/fix".format(name, best_time(func) / n * 1e6))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import argparse
+import struct
+import time
+import numpy as np
+import gprmc
+
+# Layout of one fixed-width record: time in seconds since midnight, index of the ATU
+# name in the header, 1 if the receiver reported a lock, position in decimal degrees
+# and speed in knots. 30 bytes, little-endian, unpadded.
+record_dtype = np.dtype([("time", "<f8"), ("atu", "u1"), ("valid", "u1"),
+                         ("lat", "<f8"), ("lon", "<f8"), ("speed", "<f4")])
+
+# The header is a magic number, format version, record size, number of ATUs and a table
+# of their names.
+magic = b"ATUB"
+version = 1
+max_atus = 16
+name_size = 8
+header_format = "<4sHHH" + "{0}s".format(max_atus * name_size)
+header_size = struct.calcsize(header_format)
+
+# Seconds a record may wait in the buffer before maybe_flush() writes it out, so a crash
+# or kill only ever loses about this much of the log.
+flush_interval = 1.0
+
+# Helper function for packing the header for a list of ATU names, which check_name has
+# already made sure fit.
+def pack_header(names):
+    table = b"".join(name.encode("ascii").ljust(name_size, b"\0") for name in names)
+    return struct.pack(header_format, magic, version, record_dtype.itemsize, len(names), table)
+
+# Helper function for making sure an ATU name can go in the header as it is: ASCII, and
+# short enough that it is never cut down to the same name as another ATU.
+def check_name(name):
+    if not name.isascii() or "\0" in name:
+        raise ValueError("ATU name {0!r} is not plain ASCII".format(name))
+    if len(name) > name_size:
+        raise ValueError("ATU name {0!r} is longer than {1} characters".format(name, name_size))
+
+# Buffered writer for binary telemetry logs. Records are collected in a preallocated
+# array and written out in one call when it fills up, when maybe_flush() finds the oldest
+# has waited flush_interval seconds, or when the log is closed. The header only has room
+# for max_atus names, so records from any ATU after that are counted in dropped instead.
+class BinaryLogWriter:
+    def __init__(self, file_name, buffer_size=256, flush_interval=flush_interval):
+        self.file = open(file_name, "wb")
+        self.names = []
+        self.buffer = np.zeros(buffer_size, dtype=record_dtype)
+        self.count = 0
+        self.dropped = 0
+        self.flush_interval = flush_interval
+        self.buffer_start = 0.0
+        self.file.write(pack_header(self.names))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Look up the id of an ATU, adding it to the header the first time it is seen. Returns
+    # None once the header is full, and raises ValueError for a name it can't hold, either
+    # way leaving the header as it was.
+    def atu_id(self, name):
+        try:
+            return self.names.index(name)
+        except ValueError:
+            pass
+        check_name(name)
+        if len(self.names) == max_atus:
+            return None
+        self.names.append(name)
+
+        # Rewrite the header in place, then carry on appending.
+        self.file.seek(0)
+        self.file.write(pack_header(self.names))
+        self.file.seek(0, 2)
+        return len(self.names) - 1
+
+    # Add a gprmc.Fix from the named ATU to the log.
+    def write(self, fix, atu_name=""):
+        atu = self.atu_id(atu_name)
+        if atu is None:
+            self.dropped += 1
+            return
+        if self.count == 0:
+            self.buffer_start = time.monotonic()
+        record = self.buffer[self.count]
+        record["time"] = fix.time
+        record["atu"] = atu
+        record["valid"] = fix.valid
+        record["lat"] = fix.lat
+        record["lon"] = fix.lon
+        record["speed"] = fix.speed
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    # Add a whole array of fixes (gprmc.fix_dtype) from the named ATU at once.
+    def write_array(self, fixes, atu_name=""):
+        atu = self.atu_id(atu_name)
+        if atu is None:
+            self.dropped += len(fixes)
+            return
+        self.flush()
+        records = np.zeros(len(fixes), dtype=record_dtype)
+        records["atu"] = atu
+        for field in ("time", "valid", "lat", "lon", "speed"):
+            records[field] = fixes[field]
+        records.tofile(self.file)
+
+    # Write out the buffer if its oldest record has waited flush_interval seconds. Call
+    # this now and then so records still make it to disk when few are coming in.
+    def maybe_flush(self):
+        if self.count > 0 and time.monotonic() - self.buffer_start >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.count > 0:
+            self.buffer[:self.count].tofile(self.file)
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Helper function for loading a binary log. Returns the list of ATU names and a NumPy
+# structured array of every record (record_dtype).
+def load(file_name):
+    with open(file_name, "rb") as log:
+        header = log.read(header_size)
+        if len(header) < header_size:
+            raise ValueError(file_name + " is not a binary telemetry log")
+        file_magic, file_version, record_size, num_atus, table = struct.unpack(header_format, header)
+        if file_magic != magic or file_version != version or record_size != record_dtype.itemsize:
+            raise ValueError(file_name + " is not a version {0} binary telemetry log".format(version))
+        records = np.fromfile(log, dtype=record_dtype)
+
+    names = [table[i * name_size:(i + 1) * name_size].rstrip(b"\0").decode("ascii")
+             for i in range(num_atus)]
+    return names, records
+
+# Helper function for converting a raw .txt capture (single or multi-ATU) to a binary log.
+# Returns the number of records written; records from ATUs whose names don't fit are left out.
+def convert(input_file, output_file):
+    with open(input_file, "rb") as filestream:
+        data = filestream.read()
+
+    with BinaryLogWriter(output_file) as writer:
+        # Single ATU captures can be decoded in one pass.
+        if b"?," not in data:
+            fixes = gprmc.parse_buffer(data)
+            writer.write_array(fixes)
+            return len(fixes)
+
+        # Multi-ATU captures tag each record with a name (<GPS data>?,<name>@).
+        count = 0
+        for record in data.split(b"@"):
+            cur_line, _, atu_name = record.rpartition(b"?,")
+            fix = gprmc.parse_sentence(cur_line)
+            if fix is None or not atu_name.isalnum():
+                continue
+            try:
+                writer.write(fix, atu_name.decode("ascii"))
+            except ValueError:
+                continue
+            count += 1
+        return count - writer.dropped
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Convert raw .txt ATU captures to binary logs.")
+    parser.add_argument("input_files", nargs="+", help="captures to convert")
+    args = parser.parse_args()
+
+    for input_file in args.input_files:
+        output_file = input_file.rsplit(".", 1)[0] + ".bin"
+        count = convert(input_file, output_file)
+        print("{0} -> {1}: {2} records".format(input_file, output_file, count))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import lzma
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# Compressors by name: the id stored in the file, compress and decompress functions, and
+# the extension of the files.
+codecs = {
+    "zlib": (1, lambda data: zlib.compress(data, 6), zlib.decompress, ".logz"),
+    "lzma": (2, lzma.compress, lzma.decompress, ".logxz"),
+}
+decompressors = {codec_id: decompress for codec_id, _, decompress, _ in codecs.values()}
+
+# Every file starts with a magic number, format version and the id of its codec.
+magic = b"CLOG"
+version = 1
+file_header = struct.Struct("<4sHH")
+
+# Each block is its compressed size, uncompressed size and the CRC32 of the uncompressed
+# data, then the compressed data. Inside a block every record is prefixed with its length.
+# A block header of all zeros marks the end of a session that was closed cleanly.
+block_header = struct.Struct("<III")
+record_header = struct.Struct("<I")
+end_marker = block_header.pack(0, 0, 0)
+
+# Bytes of records collected before they are handed off as a block, and seconds a record
+# may wait for the rest of its block before it is handed off anyway.
+batch_size = 65536
+flush_interval = 1.0
+
+# A new file is started once the current one holds this many bytes or is this many
+# seconds old.
+max_file_size = 16 * 1024 * 1024
+max_file_age = 3600.0
+
+# Blocks allowed to wait for the background thread before new ones are dropped.
+queue_depth = 64
+
+# Seconds between looks for more data when following a log that is still being written.
+poll_interval = 0.25
+
+# Helper function for a session name that no earlier session has used: the base name
+# with the date and time, and a counter if that is taken too.
+def new_session(base_name):
+    stamp = base_name + time.strftime("-%Y%m%d-%H%M%S")
+    session = stamp
+    n = 1
+    while glob.glob(glob.escape(session) + "-*"):
+        session = "%s-%d" % (stamp, n)
+        n += 1
+    return session
+
+# Compressed, rotating log of records (bytes or str). The acquisition loop only ever
+# adds records to a list: full batches are handed to a background thread, which
+# compresses them into blocks and writes them out, starting a new file of the session
+# when the current one gets too big or too old. Each session's files are named
+# <session>-0000.logz, <session>-0001.logz, ..., and are opened so that an existing file
+# is never overwritten. If the disk falls behind far enough to fill the queue, batches
+# are dropped and counted rather than holding up the caller.
+class CompressedLogWriter:
+    def __init__(self, base_name, codec="zlib", batch_size=batch_size, flush_interval=flush_interval,
+                 max_file_size=max_file_size, max_file_age=max_file_age, queue_depth=queue_depth):
+        self.codec_id, self.compress, _, self.extension = codecs[codec]
+        self.base_name = base_name
+        self.session = new_session(base_name)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.max_file_age = max_file_age
+        self.batch = []
+        self.batch_bytes = 0
+        self.batch_start = 0.0
+        self.queue = queue.Queue(queue_depth)
+        self.files = []
+        self.records = 0
+        self.queue_dropped = 0
+        self.write_dropped = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="log writer", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Records lost so far. Each count is only ever updated by one thread, the caller's for
+    # a full queue and the background thread's for a failed write, so neither loses updates.
+    @property
+    def dropped(self):
+        return self.queue_dropped + self.write_dropped
+
+    def write(self, record):
+        if isinstance(record, str):
+            record = record.encode("utf-8")
+        if not self.batch:
+            self.batch_start = time.monotonic()
+        self.batch.append(record_header.pack(len(record)))
+        self.batch.append(record)
+        self.batch_bytes += len(record)
+        self.records += 1
+        if self.batch_bytes >= self.batch_size:
+            self.flush()
+
+    # Hand off the current batch if its oldest record has waited flush_interval seconds.
+    # Call this now and then so records still make it to disk when few are coming in.
+    def maybe_flush(self):
+        if self.batch and time.monotonic() - self.batch_start >= self.flush_interval:
+            self.flush()
+
+    # Hand the current batch to the background thread without waiting for it.
+    def flush(self):
+        if not self.batch:
+            return
+        batch = self.batch
+        self.batch = []
+        self.batch_bytes = 0
+        try:
+            self.queue.put_nowait(batch)
+        except queue.Full:
+            self.queue_dropped += len(batch) // 2
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    # Open the next file of the session, moving on to a new session name in the unlikely
+    # case another writer got to it first.
+    def open_file(self):
+        while True:
+            file_name = "%s-%04d%s" % (self.session, len(self.files), self.extension)
+            try:
+                file = open(file_name, "xb")
+                break
+            except FileExistsError:
+                self.session = new_session(self.base_name)
+                self.files = []
+        file.write(file_header.pack(magic, version, self.codec_id))
+        self.files.append(file_name)
+        return file
+
+    def run(self):
+        file = None
+        size = 0
+        opened = 0.0
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            data = b"".join(batch)
+            block = self.compress(data)
+            try:
+                if file is None or size >= self.max_file_size or time.monotonic() - opened >= self.max_file_age:
+                    if file is not None:
+                        file.close()
+                    file = self.open_file()
+                    size = file_header.size
+                    opened = time.monotonic()
+                file.write(block_header.pack(len(block), len(data), zlib.crc32(data)))
+                file.write(block)
+                file.flush()
+            except OSError as error:
+                # Keep draining the queue so the caller is never held up by a full disk,
+                # starting a new file with the next block.
+                self.error = error
+                self.write_dropped += len(batch) // 2
+                if file is not None:
+                    try:
+                        file.close()
+                    except OSError:
+                        pass
+                file = None
+                continue
+            size += block_header.size + len(block)
+            self.raw_bytes += len(data)
+            self.compressed_bytes += block_header.size + len(block)
+        if file is not None:
+            try:
+                file.write(end_marker)
+            except OSError as error:
+                self.error = error
+            file.close()
+
+# Files that make up a log, in order. name is either a session name or a single file.
+def session_files(name):
+    if os.path.isfile(name):
+        return [name]
+    return sorted(glob.glob(glob.escape(name) + "-[0-9][0-9][0-9][0-9].*"))
+
+# Helper function for telling whether name is a compressed log file or session.
+def is_compressed_log(name):
+    files = session_files(name)
+    if not files:
+        return False
+    with open(files[0], "rb") as log:
+        return log.read(len(magic)) == magic
+
+# Decompressed contents of every block in a file, in order. A block cut short at the end
+# of the file (by a crash or power loss) ends the file, and damaged blocks are skipped.
+# The end of session marker comes back as None. Given wait, a file that is still being
+# written is followed instead: whenever the data runs out, wait() is called and reading
+# picks up where it left off, unless it returns False.
+def read_blocks(file_name, wait=None):
+    with open(file_name, "rb") as log:
+        header = log.read(file_header.size)
+        while len(header) < file_header.size and wait is not None and wait():
+            log.seek(0)
+            header = log.read(file_header.size)
+        if len(header) < file_header.size:
+            raise ValueError(file_name + " is not a compressed log")
+        file_magic, file_version, codec_id = file_header.unpack(header)
+        if file_magic != magic or file_version != version or codec_id not in decompressors:
+            raise ValueError(file_name + " is not a version {0} compressed log".format(version))
+        decompress = decompressors[codec_id]
+
+        while True:
+            position = log.tell()
+            header = log.read(block_header.size)
+            if len(header) == block_header.size:
+                size, raw_size, crc = block_header.unpack(header)
+                block = log.read(size)
+            if len(header) < block_header.size or len(block) < size:
+                if wait is None or not wait():
+                    return
+                log.seek(position)
+                continue
+            if header == end_marker:
+                yield None
+                return
+            try:
+                data = decompress(block)
+            except (zlib.error, lzma.LZMAError):
+                continue
+            if len(data) == raw_size and zlib.crc32(data) == crc:
+                yield data
+
+# Stream every record of a log (session name or file) back in the order it was written.
+# With follow set, a session that is still being written is followed like tail -f until
+# its writer closes it. pause(poll_interval) is called whenever there is nothing new yet,
+# so a viewer can pass something that keeps its window responsive while it waits.
+def read_records(name, follow=False, poll_interval=poll_interval, pause=time.sleep):
+    index = 0
+    while True:
+        files = session_files(name)
+        if index == len(files):
+            if not follow:
+                return
+            pause(poll_interval)
+            continue
+
+        # A file is finished once the writer has moved on to the next one. Look at it once
+        # more after noticing, in case its last block went in just before.
+        finished = []
+        def wait():
+            if finished:
+                return False
+            if len(session_files(name)) > index + 1:
+                finished.append(True)
+            else:
+                pause(poll_interval)
+            return True
+
+        for data in read_blocks(files[index], wait if follow else None):
+            if data is None:
+                return
+            offset = 0
+            while offset < len(data):
+                size, = record_header.unpack_from(data, offset)
+                offset += record_header.size
+                yield data[offset:offset + size]
+                offset += size
+        index += 1
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Decompress logs written by CompressedLogWriter.")
+    parser.add_argument("logs", nargs="+", help="session names or log files to read")
+    parser.add_argument("--output", help="file to write the records to, one after another (default: stdout)")
+    parser.add_argument("--stats", action="store_true", help="only print the size of each log")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep reading a session that is still being written until its writer closes it")
+    args = parser.parse_args()
+
+    if args.stats:
+        for name in args.logs:
+            files = session_files(name)
+            compressed = sum(os.path.getsize(file_name) for file_name in files)
+            records = raw = 0
+            for record in read_records(name):
+                records += 1
+                raw += len(record)
+            print("%s: %d files, %d records, %d bytes -> %d bytes compressed (%.1fx)" % (
+                name, len(files), records, raw, compressed, raw / max(1, compressed)))
+    else:
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        for name in args.logs:
+            for record in read_records(name, args.follow):
+                output.write(record)
+                if args.follow:
+                    output.flush()
+        output.flush()
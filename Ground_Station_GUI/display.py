@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Helper function for telling whether there is a display to plot on. Only Linux and other
+# X11/Wayland systems can be without one.
+def display_available():
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import json
+import selectors
+import socket
+import threading
+import time
+import gprmc
+
+# Address the ground station publishes fixes on by default: this machine only. Listen on
+# 0.0.0.0 instead to let other laptops on the network subscribe.
+default_host = "127.0.0.1"
+default_port = 47300
+
+# Bytes of fixes a subscriber may fall behind by before new fixes are skipped for it,
+# and seconds it may go without taking any data before it is disconnected.
+max_backlog = 16384
+stall_timeout = 5.0
+
+# Kernel send buffer for each subscriber, kept small so a subscriber that stops reading
+# shows up as falling behind within seconds rather than after megabytes.
+send_buffer = 65536
+
+# Fixes waiting for the server thread. If it ever falls this far behind, the oldest are
+# dropped and counted.
+queue_depth = 1024
+
+# Helper function for encoding a fix as one line of JSON. seq numbers every published fix
+# so subscribers can tell when they have been skipped, and sent is the time.time() it was
+# published at.
+def encode_fix(seq, atu, fix, sent):
+    message = {"seq": seq, "atu": atu, "time": fix.time, "valid": bool(fix.valid),
+               "lat": fix.lat, "lon": fix.lon, "speed": fix.speed, "sent": sent}
+    return (json.dumps(message) + "\n").encode("ascii")
+
+# A connected subscriber and the fixes that haven't been sent to it yet.
+class Subscriber:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+        self.skipped = 0
+        self.last_progress = time.monotonic()
+
+# Publishes each fix to any number of TCP subscribers as lines of JSON. publish() only
+# encodes the fix once and queues it, so the ingest loop never waits on the network;
+# everything else happens on the server thread. A subscriber that can't keep up has
+# fixes skipped for it (down-sampling it) while its backlog is full, and is
+# disconnected if it takes nothing at all for stall_timeout seconds.
+class FixServer(threading.Thread):
+    def __init__(self, host=default_host, port=default_port, max_backlog=max_backlog,
+                 stall_timeout=stall_timeout):
+        super().__init__(daemon=True)
+        self.max_backlog = max_backlog
+        self.stall_timeout = stall_timeout
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.wake_read, self.wake_write = socket.socketpair()
+        self.wake_read.setblocking(False)
+        self.wake_write.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.queue = collections.deque(maxlen=queue_depth)
+        self.subscribers = {}
+        self.seq = 0
+        self.overflowed = 0
+        self.skipped = 0
+        self.disconnected = 0
+        self.running = True
+
+    # Number of subscribers connected right now.
+    @property
+    def subscriber_count(self):
+        return len(self.subscribers)
+
+    # Publish a fix (gprmc.Fix) from the named ATU to every subscriber.
+    def publish(self, fix, atu=""):
+        if len(self.queue) == self.queue.maxlen:
+            self.overflowed += 1
+        self.queue.append(encode_fix(self.seq, atu, fix, time.time()))
+        self.seq += 1
+        try:
+            self.wake_write.send(b"\0")
+        except OSError:
+            pass
+
+    def stop(self):
+        self.running = False
+        try:
+            self.wake_write.send(b"\0")
+        except OSError:
+            pass
+        self.join()
+
+    def run(self):
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.wake_read, selectors.EVENT_READ)
+        while self.running:
+            for key, events in self.selector.select(timeout=0.5):
+                if key.fileobj is self.listener:
+                    self.accept()
+                elif key.fileobj is self.wake_read:
+                    self.clear_wakeups()
+                else:
+                    subscriber = key.data
+                    if events & selectors.EVENT_READ:
+                        self.receive(subscriber)
+                    if events & selectors.EVENT_WRITE and subscriber.sock in self.subscribers:
+                        self.send(subscriber)
+            self.fan_out()
+            self.drop_stalled()
+
+        for subscriber in list(self.subscribers.values()):
+            self.close(subscriber)
+        self.selector.close()
+        self.listener.close()
+        self.wake_read.close()
+        self.wake_write.close()
+
+    def accept(self):
+        try:
+            sock, address = self.listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        subscriber = Subscriber(sock, address)
+        self.subscribers[sock] = subscriber
+        self.selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def clear_wakeups(self):
+        try:
+            while self.wake_read.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    # Subscribers don't send anything, so reading is only to notice them hanging up.
+    def receive(self, subscriber):
+        try:
+            data = subscriber.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.close(subscriber)
+
+    # Add every queued fix to each subscriber's buffer, skipping those with a full
+    # backlog, then send as much as each socket will take.
+    def fan_out(self):
+        if not self.queue:
+            return
+        messages = []
+        while self.queue:
+            messages.append(self.queue.popleft())
+        for subscriber in list(self.subscribers.values()):
+            for message in messages:
+                if len(subscriber.buffer) + len(message) > self.max_backlog:
+                    subscriber.skipped += 1
+                    self.skipped += 1
+                    continue
+                if not subscriber.buffer:
+                    subscriber.last_progress = time.monotonic()
+                subscriber.buffer += message
+            self.send(subscriber)
+
+    def send(self, subscriber):
+        if subscriber.buffer:
+            try:
+                sent = subscriber.sock.send(subscriber.buffer)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.close(subscriber)
+                return
+            if sent:
+                del subscriber.buffer[:sent]
+                subscriber.last_progress = time.monotonic()
+
+        # Only wait for the socket to be writable while there is something left to send.
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.buffer else 0)
+        self.selector.modify(subscriber.sock, events, subscriber)
+
+    def drop_stalled(self):
+        now = time.monotonic()
+        for subscriber in list(self.subscribers.values()):
+            if subscriber.buffer and now - subscriber.last_progress > self.stall_timeout:
+                self.disconnected += 1
+                self.close(subscriber)
+
+    def close(self, subscriber):
+        self.selector.unregister(subscriber.sock)
+        del self.subscribers[subscriber.sock]
+        subscriber.sock.close()
+
+# Client for a FixServer. Iterating over it yields (seq, ATU name, gprmc.Fix, sent time)
+# for every fix received, until the server goes away. missed counts fixes the server
+# skipped for this subscriber.
+class FixSubscriber:
+    def __init__(self, host=default_host, port=default_port, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile("rb")
+        self.next_seq = None
+        self.received = 0
+        self.missed = 0
+
+    def __iter__(self):
+        for line in self.file:
+            message = json.loads(line)
+            seq = message["seq"]
+            if self.next_seq is not None and seq > self.next_seq:
+                self.missed += seq - self.next_seq
+            self.next_seq = seq + 1
+            self.received += 1
+            fix = gprmc.Fix(message["time"], message["valid"], message["lat"], message["lon"], message["speed"])
+            yield seq, message["atu"], fix, message["sent"]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Watch or log the fixes a ground station is publishing.")
+    parser.add_argument("--host", default=default_host, help="ground station to connect to")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--log", help="also log the fixes to a compressed log session with this base name")
+    args = parser.parse_args()
+
+    subscriber = FixSubscriber(args.host, args.port)
+    log = None
+    if args.log:
+        from compressed_log import CompressedLogWriter
+        log = CompressedLogWriter(args.log)
+        print("Logging to " + log.session)
+
+    try:
+        for seq, atu, fix, sent in subscriber:
+            output_str = gprmc.format_fix(fix.time, fix.lat, fix.lon)
+            if atu:
+                output_str = (atu + ":").ljust(8) + output_str
+            print(output_str)
+            if log is not None:
+                log.write(output_str + "\n")
+                log.maybe_flush()
+    except KeyboardInterrupt:
+        pass
+    print("%d fixes received, %d skipped by the server" % (subscriber.received, subscriber.missed))
+    subscriber.close()
+    if log is not None:
+        log.close()
@@ -0,0 +1,82 @@
+import re
+
+# A record starts at "$" and runs up to the next "@", newline or "$". Nothing about
+# its length is assumed, so a dropped byte only costs the record it was in.
+record_pattern = re.compile(rb"\$[^$@\r\n]*")
+
+# Bytes that are expected between records.
+delimiters = b"@\r\n"
+
+# Splits the byte stream from an ATU into records. Whatever is waiting on the port is
+# read in one go into a reusable buffer, complete records are handed back, and a partial
+# record at the end is carried over to the next read. Anything that can't be part of a
+# record (stray bytes between records, a record with no end in sight) is thrown away,
+# which resynchronizes on the next "$", and counted as a framing error. Noise and broken
+# records that run into each other are one error however many reads they span; the span
+# ends at the next good record or at a delimiter.
+class RecordFramer:
+    def __init__(self, chunk_size=4096, max_record=128):
+        self.chunk = bytearray(chunk_size)
+        self.view = memoryview(self.chunk)
+        self.buffer = bytearray()
+        self.max_record = max_record
+        self.records = 0
+        self.framing_errors = 0
+        self.discarding = False
+
+    # Read whatever is waiting on an open serial port (at least one byte, so this blocks
+    # up to the port's timeout when the link is quiet) and return the complete records.
+    def read(self, ser):
+        size = max(1, min(ser.in_waiting, len(self.chunk)))
+        count = ser.readinto(self.view[:size])
+        return self.feed(self.view[:count])
+
+    # Add bytes to the stream and return every record they complete.
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        records = []
+        pos = 0
+
+        for match in record_pattern.finditer(buffer):
+            # Anything other than delimiters before the record is noise.
+            self.skip(buffer[pos:match.start()])
+            pos = match.start()
+
+            # A record running to the end of the buffer may not have arrived in full yet.
+            if match.end() == len(buffer):
+                if match.end() - match.start() > self.max_record:
+                    self.discard()
+                    pos = len(buffer)
+                break
+
+            if match.end() - match.start() > self.max_record:
+                self.discard()
+            else:
+                records.append(bytes(match.group()))
+                self.discarding = False
+            pos = match.end()
+
+        # No record left in the buffer, so whatever remains can't start one.
+        else:
+            self.skip(buffer[pos:])
+            pos = len(buffer)
+
+        del buffer[:pos]
+        self.records += len(records)
+        return records
+
+    # Throw away bytes that can't be part of a record, counting a framing error only if
+    # they start a new span of them.
+    def discard(self):
+        if not self.discarding:
+            self.framing_errors += 1
+        self.discarding = True
+
+    # Skip the bytes between records: noise is discarded, while delimiters alone end
+    # whatever span was being discarded.
+    def skip(self, gap):
+        if gap.strip(delimiters):
+            self.discard()
+        elif gap:
+            self.discarding = False
@@ -0,0 +1,128 @@
+import collections
+import re
+import numpy as np
+
+# A single decoded $GPRMC fix. Time is in seconds since midnight UTC, latitude and
+# longitude are in signed decimal degrees, speed is in knots (NaN if missing) and
+# valid is True when the receiver reported an "A" (active) status.
+Fix = collections.namedtuple("Fix", ["time", "valid", "lat", "lon", "speed"])
+
+# Layout of the NumPy record array returned by parse_buffer().
+fix_dtype = np.dtype([("time", np.float64), ("valid", np.bool_), ("lat", np.float64),
+                      ("lon", np.float64), ("speed", np.float32)])
+
+# Regex for extracting every field of every record in a buffer in one pass. The first
+# group is the whole record. The fraction of a second is optional, as parse_sentence
+# allows, and so is the checksum since the ATUs truncate the sentence after the speed.
+record_pattern = re.compile(rb"(\$GPRMC,([0-9]{6}(?:\.[0-9]+)?),(A|V),([0-9]{4}\.[0-9]+),(N|S),"
+                            rb"([0-9]{5}\.[0-9]+),(E|W)(?:,([0-9]+\.[0-9]+))?"
+                            rb"([^$*@]*\*[0-9A-Fa-f]{2})?)")
+
+# Helper function for checking an NMEA checksum, the XOR of every character between
+# the "$" and the "*".
+def checksum_ok(body, checksum):
+    value = 0
+    for c in body:
+        value ^= ord(c)
+    try:
+        return value == int(checksum, 16)
+    except ValueError:
+        return False
+
+# Helper function for decoding a single $GPRMC sentence in one pass. Accepts str or
+# bytes and returns a Fix, or None if the sentence is malformed or fails its checksum.
+def parse_sentence(sentence):
+    if isinstance(sentence, (bytes, bytearray)):
+        try:
+            sentence = sentence.decode("ascii")
+        except UnicodeDecodeError:
+            return None
+
+    start = sentence.find("$GPRMC,")
+    if start < 0:
+        return None
+
+    # Validate and strip the checksum if the sentence carries one.
+    star = sentence.find("*", start)
+    if star >= 0:
+        if not checksum_ok(sentence[start + 1:star], sentence[star + 1:star + 3]):
+            return None
+        sentence = sentence[start:star]
+    else:
+        sentence = sentence[start:]
+
+    fields = sentence.split(",", 8)
+    if len(fields) < 7:
+        return None
+    _, time_str, status, lat_str, ns, lon_str, ew = fields[:7]
+    if len(time_str) < 6 or len(lat_str) < 5 or len(lon_str) < 6:
+        return None
+
+    try:
+        time = int(time_str[0:2]) * 3600 + int(time_str[2:4]) * 60 + float(time_str[4:])
+        lat = int(lat_str[0:2]) + float(lat_str[2:]) / 60
+        lon = int(lon_str[0:3]) + float(lon_str[3:]) / 60
+    except ValueError:
+        return None
+
+    # Apply the hemispheres.
+    if ns == "S":
+        lat = -lat
+    elif ns != "N":
+        return None
+    if ew == "W":
+        lon = -lon
+    elif ew != "E":
+        return None
+
+    # Speed is optional and the two-ATU link appends "?,<name>" after it, so don't
+    # reject the fix over it.
+    try:
+        speed = float(fields[7].partition("?")[0])
+    except (IndexError, ValueError):
+        speed = float("nan")
+
+    return Fix(time, status == "A", lat, lon, speed)
+
+# Helper function for decoding every $GPRMC record in a bytes buffer at once. Returns
+# a NumPy record array with fix_dtype, one entry per well-formed record. Records that
+# carry a checksum are only kept if it matches.
+def parse_buffer(data):
+    matches = record_pattern.findall(data)
+    fixes = np.zeros(len(matches), dtype=fix_dtype)
+    if len(matches) == 0:
+        return fixes
+    records, times, statuses, lats, ns, lons, ew, speeds, checksums = zip(*matches)
+
+    # Break hhmmss.sss into seconds since midnight.
+    time = to_array(times)
+    fixes["time"] = (time // 10000) * 3600 + (time // 100 % 100) * 60 + time % 100
+    fixes["valid"] = np.array(statuses) == b"A"
+
+    # Convert ddmm.mmmm and dddmm.mmmm to decimal degree form.
+    lat = to_array(lats)
+    lon = to_array(lons)
+    fixes["lat"] = lat // 100 + (lat % 100) / 60
+    fixes["lat"][np.array(ns) == b"S"] *= -1
+    fixes["lon"] = lon // 100 + (lon % 100) / 60
+    fixes["lon"][np.array(ew) == b"W"] *= -1
+    fixes["speed"] = [float(speed) if speed else np.nan for speed in speeds]
+
+    # Checksums are rare on the ATU link, so only those records take the scalar path.
+    keep = np.ones(len(fixes), dtype=np.bool_)
+    for i, checksum in enumerate(checksums):
+        if checksum:
+            keep[i] = parse_sentence(records[i]) is not None
+    return fixes[keep]
+
+# Helper function for converting a sequence of numeric byte strings into a float array.
+def to_array(values):
+    return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+
+# Helper function for formatting a fix time and position the way the ground station logs it.
+def format_fix(time, lat, lon):
+    hour, rem = divmod(time, 3600)
+    minute, second = divmod(rem, 60)
+    second_str = "{0:.3f}".format(second).zfill(6)
+    output_str = "{0:02d}:{1:02d}:{2} -> {3:.4f}, {4:.4f}"
+    return output_str.format(int(hour), int(minute), second_str, lat, lon)
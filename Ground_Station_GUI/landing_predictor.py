@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import math
+import time
+import numpy as np
+
+# Trajectories propagated per update.
+num_samples = 4000
+
+# Seconds of recent track the drift velocity is estimated from, and the fewest fixes
+# needed for an estimate.
+drift_window = 20.0
+min_fixes = 5
+
+# Descent rate under canopy in m/s, and its spread (1 sigma) as a fraction of it.
+descent_rate = 6.0
+descent_rate_spread = 0.15
+
+# Wind the recent track can't show, i.e. how much the wind changes on the way down, in
+# m/s (1 sigma) on each axis by the time the vehicle reaches the ground. The descent is
+# split into layers with the change building up from one layer to the next.
+wind_spread = 1.5
+wind_layers = 8
+
+# Key that starts the descent countdown at the newest fix on a live plot.
+descent_key = "d"
+
+# Fraction of trajectories the footprint ellipse holds, and its size in standard
+# deviations for a 2D normal distribution.
+confidence = 0.95
+ellipse_scale = math.sqrt(-2 * math.log(1 - confidence))
+
+# Predicted landing area: center in meters, full width and height of the ellipse, angle
+# of its width from east in degrees, and the nominal seconds left until landing.
+Footprint = collections.namedtuple("Footprint", ["x", "y", "width", "height", "angle", "time_left"])
+
+# Monte Carlo landing footprint from a descending track. Each update fits the drift
+# velocity to the last drift_window seconds of fixes, then propagates num_samples
+# descents from the current position at once as NumPy arrays, each with its own descent
+# rate, error in the drift velocity and change in the wind with altitude. The track
+# itself carries no altitude, so the predictor is told when the descent started and the
+# height above the ground then, and counts down from there at the nominal descent rate.
+# Until it knows when the descent started (descent_start, or start_descent() once the
+# descent is seen) it predicts nothing, so time on the pad and the ascent never count.
+class LandingPredictor:
+    def __init__(self, altitude, descent_rate=descent_rate, descent_rate_spread=descent_rate_spread,
+                 wind_spread=wind_spread, num_samples=num_samples, seed=None, descent_start=None):
+        self.altitude = altitude
+        self.descent_rate = descent_rate
+        self.descent_rate_spread = descent_rate_spread
+        self.wind_spread = wind_spread
+        self.num_samples = num_samples
+        self.rng = np.random.default_rng(seed)
+        self.start_time = descent_start
+        self.times = collections.deque()
+        self.xs = collections.deque()
+        self.ys = collections.deque()
+
+    # Add a fix: time in seconds (e.g. since midnight) and position in meters.
+    def add(self, t, x, y):
+        # Start over if the clock went backwards (midnight, or a new capture).
+        if self.times and t < self.times[-1]:
+            self.times.clear()
+            self.xs.clear()
+            self.ys.clear()
+        self.times.append(t)
+        self.xs.append(x)
+        self.ys.append(y)
+        while self.times[-1] - self.times[0] > drift_window:
+            self.times.popleft()
+            self.xs.popleft()
+            self.ys.popleft()
+
+    # Start the descent countdown at time t, in the same seconds as add().
+    def start_descent(self, t):
+        self.start_time = t
+
+    # Height above the ground at time t, counting down at the nominal descent rate.
+    def height(self, t):
+        return self.altitude - self.descent_rate * (t - self.start_time)
+
+    # Least squares fit of position against time over the window. Returns the fitted
+    # position at the newest fix, the velocity, and the standard error of the velocity.
+    def drift(self):
+        t = np.array(self.times)
+        positions = np.array((self.xs, self.ys))
+        t_mean = t.mean()
+        dt = t - t_mean
+        spread = np.dot(dt, dt)
+        means = positions.mean(axis=1)
+        velocity = (positions - means[:, None]) @ dt / spread
+        residuals = positions - means[:, None] - velocity[:, None] * dt
+        velocity_error = np.sqrt((residuals ** 2).sum(axis=1) / max(1, len(t) - 2) / spread)
+        return means + velocity * (t[-1] - t_mean), velocity, velocity_error
+
+    # Footprint for the newest fix, or None if the descent hasn't started, there aren't
+    # enough fixes yet or the vehicle should already be on the ground.
+    def predict(self):
+        if self.start_time is None or self.times and self.times[-1] < self.start_time:
+            return None
+        if len(self.times) < min_fixes or self.times[-1] == self.times[0]:
+            return None
+        remaining = self.height(self.times[-1])
+        if remaining <= 0:
+            return None
+        position, velocity, velocity_error = self.drift()
+
+        # Time left for each trajectory, from its own descent rate.
+        n = self.num_samples
+        rates = self.descent_rate * (1 + self.descent_rate_spread * self.rng.standard_normal(n))
+        time_left = remaining / np.maximum(rates, 0.25 * self.descent_rate)
+
+        # Wind for each trajectory: the fitted drift, its error, and a random walk through
+        # the layers below. Each layer takes an equal share of the fall, so the mean wind
+        # over the fall is the mean over the layers.
+        wind = velocity + velocity_error * self.rng.standard_normal((n, 2))
+        steps = self.rng.standard_normal((n, wind_layers, 2)) * (self.wind_spread / math.sqrt(wind_layers))
+        wind += np.cumsum(steps, axis=1).mean(axis=1)
+        landings = position + wind * time_left[:, None]
+
+        # Ellipse from the covariance of the landing points.
+        center = landings.mean(axis=0)
+        variances, axes = np.linalg.eigh(np.cov(landings.T))
+        width, height = 2 * ellipse_scale * np.sqrt(np.maximum(variances[::-1], 0))
+        angle = math.degrees(math.atan2(axes[1, 1], axes[0, 1]))
+        return Footprint(float(center[0]), float(center[1]), float(width), float(height), angle,
+                         remaining / self.descent_rate)
+
+# Helper function for reading a UTC time of day given as hhmmss[.sss] or hh:mm:ss[.sss]
+# into seconds since midnight, like gprmc.Fix.time. Meant as an argparse type.
+def time_of_day(text):
+    digits = text.replace(":", "")
+    if len(digits) < 6 or not digits[:6].isdigit():
+        raise ValueError(text)
+    return int(digits[0:2]) * 3600 + int(digits[2:4]) * 60 + float(digits[4:])
+
+# Helper function for letting descent_key start the descent countdown of a predictor at
+# its newest fix, on a live plot where the start of the descent wasn't known ahead of time.
+def bind_descent_key(fig, predictor):
+    def on_key(event):
+        if event.key == descent_key and predictor.times:
+            predictor.start_descent(predictor.times[-1])
+            print("Descent started at {0:.1f} s".format(predictor.times[-1]))
+    fig.canvas.mpl_connect("key_press_event", on_key)
+
+# Helper function for the axis-aligned bounds (x_min, x_max, y_min, y_max) of a footprint.
+def footprint_bounds(footprint):
+    a, b = footprint.width / 2, footprint.height / 2
+    angle = math.radians(footprint.angle)
+    half_x = math.hypot(a * math.cos(angle), b * math.sin(angle))
+    half_y = math.hypot(a * math.sin(angle), b * math.cos(angle))
+    return (footprint.x - half_x, footprint.x + half_x, footprint.y - half_y, footprint.y + half_y)
+
+# Helper function for the text shown under the distance and angle: where the footprint
+# is from the origin and how long until landing.
+def footprint_text(footprint):
+    distance = math.hypot(footprint.x, footprint.y)
+    angle = math.degrees(math.atan2(footprint.y, footprint.x))
+    return "Landing: {0:.0f} m at {1:.0f}$^\\circ$ in {2:.0f} s".format(distance, angle, footprint.time_left)
+
+# Helper function for telling whether the point (x, y) is inside a footprint.
+def inside(footprint, x, y):
+    angle = math.radians(footprint.angle)
+    dx, dy = x - footprint.x, y - footprint.y
+    u = dx * math.cos(angle) + dy * math.sin(angle)
+    v = -dx * math.sin(angle) + dy * math.cos(angle)
+    return (u / (footprint.width / 2)) ** 2 + (v / (footprint.height / 2)) ** 2 <= 1
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Replay a capture through the landing predictor, "
+                                                 "timing each update and checking it against where the track ends.")
+    parser.add_argument("input_file", nargs="?", default="GPRMC_Locked_2Mile_ATU_Tracking_data_noNewline.txt",
+                        help="capture to replay (.txt capture or .bin log)")
+    parser.add_argument("--descent-rate", type=float, default=descent_rate, help="descent rate under canopy in m/s")
+    parser.add_argument("--samples", type=int, default=num_samples, help="trajectories per update")
+    args = parser.parse_args()
+
+    from Ground_Station_GUI_no_serial import load_capture, project_capture
+
+    fix_time, lat, lon = load_capture(args.input_file)
+    x, y = project_capture(lat, lon)
+    x, y = x - x[0], y - y[0]
+
+    # Pretend the capture is one descent that lands at its last fix.
+    altitude = args.descent_rate * (fix_time[-1] - fix_time[0])
+    predictor = LandingPredictor(altitude, args.descent_rate, num_samples=args.samples, seed=0,
+                                 descent_start=fix_time[0])
+    costs = []
+    checks = []
+    for i in range(len(x)):
+        predictor.add(fix_time[i], x[i], y[i])
+        start = time.perf_counter()
+        footprint = predictor.predict()
+        costs.append(time.perf_counter() - start)
+        if footprint is not None:
+            checks.append((footprint.time_left, inside(footprint, x[-1], y[-1]),
+                           math.hypot(footprint.x - x[-1], footprint.y - y[-1])))
+
+    costs = np.array(costs) * 1000
+    print("%d updates of %d trajectories: %.2f ms mean, %.2f ms p99, %.2f ms max" % (
+        len(costs), args.samples, costs.mean(), np.percentile(costs, 99), costs.max()))
+    for seconds in (600, 300, 120, 60, 30, 10):
+        near = [(hit, miss) for time_left, hit, miss in checks if time_left <= seconds]
+        if near:
+            print("last %3d s: landing inside the ellipse %3.0f%% of the time, center off by %.0f m on average" % (
+                seconds, 100 * np.mean([hit for hit, _ in near]), np.mean([miss for _, miss in near])))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import argparse
+import mmap
+import os
+import re
+import zlib
+import numpy as np
+import gprmc
+
+# Regex for finding the start and time of every record in a raw ATU capture
+# ($GPRMC,...@ or $GPRMC,...?,name@).
+raw_pattern = re.compile(rb"\$GPRMC,([0-9]{2})([0-9]{2})([0-9]{2}\.[0-9]+),")
+
+# Regex for finding the start and time of every line in a ground station output.txt
+# (HH:MM:SS.sss -> lat, lon), with or without an ATU name in front.
+text_pattern = re.compile(rb"^[^\n]*?([0-9]{2}):([0-9]{2}):([0-9]{2}\.[0-9]+) -> ", re.M)
+text_line_pattern = re.compile(r"([0-9]{2}):([0-9]{2}):([0-9]{2}\.[0-9]+) -> (-?[0-9.]+), (-?[0-9.]+)")
+
+# Characters that separate one record from the next.
+delimiters = b"@\r\n"
+
+# Bump this whenever the layout of the sidecar index changes.
+index_version = 1
+
+# Number of bytes at the start of the log that are checksummed to tell if it was rewritten.
+head_size = 65536
+
+# Helper function for turning "HH:MM:SS[.sss]" or a number into seconds since midnight.
+def parse_time(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    hour, minute, second = value.split(":")
+    return int(hour) * 3600 + int(minute) * 60 + float(second)
+
+# Helper function for decoding a line of a ground station output.txt into a Fix.
+def parse_output_line(line):
+    if isinstance(line, (bytes, bytearray)):
+        line = line.decode("ascii", "replace")
+    match = text_line_pattern.search(line)
+    if match is None:
+        return None
+    time = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+    return gprmc.Fix(time, True, float(match.group(4)), float(match.group(5)), float("nan"))
+
+# Random access to a recorded capture or output.txt. The file is memory-mapped and an
+# index of record offsets and times is kept in a sidecar file (<name>.idx) so it only
+# has to be built once. If the log has grown since, only the new part is indexed.
+# Lookups by time are binary searches over the index.
+class TelemetryLog:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.index_name = file_name + ".idx"
+        self.file = open(file_name, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+        # Work out which kind of log this is from the start of the file.
+        self.raw = b"$GPRMC" in self.data[:4096]
+        self.pattern = raw_pattern if self.raw else text_pattern
+        self.parse = gprmc.parse_sentence if self.raw else parse_output_line
+
+        self.load_index()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Load the sidecar index, extending it if the log has grown, or build it from scratch.
+    def load_index(self):
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.times = np.empty(0, dtype=np.float64)
+        self.indexed_size = 0
+
+        # Only trust the index if the log is the same file it was built from, possibly longer.
+        try:
+            with open(self.index_name, "rb") as index_file:
+                index = np.load(index_file)
+                indexed_size = int(index["indexed_size"])
+                if (int(index["version"]) == index_version and indexed_size <= self.size
+                        and int(index["head_crc"]) == self.head_crc(indexed_size)):
+                    self.offsets = index["offsets"]
+                    self.times = index["times"]
+                    self.indexed_size = int(index["indexed_size"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self.indexed_size < self.size:
+            self.extend_index()
+        self.sort_times()
+
+    # Checksum of the start of the log, up to size bytes.
+    def head_crc(self, size):
+        return zlib.crc32(self.data[:min(size, head_size)])
+
+    # Index every record from the end of the last complete indexed record onwards.
+    def extend_index(self):
+        start = int(self.offsets[-1]) if len(self.offsets) else 0
+        matches = list(self.pattern.finditer(self.data, start))
+        offsets = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+        times = np.fromiter((int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+                             for m in matches), dtype=np.float64, count=len(matches))
+
+        # The last indexed record is always re-read, since it may have been cut short.
+        keep = len(self.offsets) - 1 if len(self.offsets) else 0
+        self.offsets = np.concatenate((self.offsets[:keep], offsets))
+        self.times = np.concatenate((self.times[:keep], times))
+        self.indexed_size = self.size
+
+        try:
+            with open(self.index_name, "wb") as index_file:
+                np.savez(index_file, version=index_version, indexed_size=self.indexed_size,
+                         head_crc=self.head_crc(self.size), offsets=self.offsets, times=self.times)
+        except OSError:
+            print("Could not write index " + self.index_name)
+
+    # Two-ATU logs interleave units, so times aren't always in order. Keep a sorted copy.
+    def sort_times(self):
+        if np.all(self.times[1:] >= self.times[:-1]):
+            self.order = None
+            self.sorted_times = self.times
+        else:
+            self.order = np.argsort(self.times, kind="stable")
+            self.sorted_times = self.times[self.order]
+
+    # Raw bytes of record i, without its delimiter.
+    def record(self, i):
+        start = self.offsets[i]
+        end = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.size
+        return self.data[start:end].rstrip(delimiters)
+
+    # Decoded fixes for a list of record numbers, skipping any that don't parse.
+    def fixes(self, indices):
+        fixes = []
+        for i in indices:
+            fix = self.parse(self.record(i))
+            if fix is not None:
+                fixes.append(fix)
+        return fixes
+
+    # Record numbers with times in [start, end], in time order.
+    def between(self, start, end):
+        low = np.searchsorted(self.sorted_times, parse_time(start), side="left")
+        high = np.searchsorted(self.sorted_times, parse_time(end), side="right")
+        if self.order is None:
+            return np.arange(low, high)
+        return self.order[low:high]
+
+    # Record numbers of the last n records.
+    def last(self, n):
+        return np.arange(max(0, len(self.offsets) - n), len(self.offsets))
+
+    # Record numbers of every k-th record.
+    def every(self, k):
+        return np.arange(0, len(self.offsets), k)
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Look up fixes in a recorded telemetry log.")
+    parser.add_argument("input_file", help="capture or output.txt to read")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--between", nargs=2, metavar=("START", "END"),
+                       help="fixes between two times (HH:MM:SS)")
+    group.add_argument("--last", type=int, metavar="N", help="the last N fixes")
+    group.add_argument("--every", type=int, metavar="K", help="every K-th fix")
+    args = parser.parse_args()
+
+    with TelemetryLog(args.input_file) as log:
+        if args.between:
+            indices = log.between(*args.between)
+        elif args.last:
+            indices = log.last(args.last)
+        else:
+            indices = log.every(args.every)
+
+        for fix in log.fixes(indices):
+            print(gprmc.format_fix(fix.time, fix.lat, fix.lon))
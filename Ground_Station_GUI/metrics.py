@@ -0,0 +1,137 @@
+import bisect
+import collections
+import json
+import threading
+import time
+
+# Upper edges of the latency histogram buckets in seconds, four per decade from 1 us to 100 s.
+bucket_edges = [10 ** (e / 4) for e in range(-24, 9)]
+
+# Seconds between snapshots written to the metrics log.
+log_interval = 10.0
+
+# Latency histogram with fixed log-spaced buckets, so adding a sample is a bisect and
+# an increment no matter how many samples have been taken.
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(bucket_edges) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(bucket_edges, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Upper edge of the bucket holding the q-th percentile (at most the largest sample), in seconds.
+    def percentile(self, q):
+        if self.total == 0:
+            return None
+        target = self.total * q / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(bucket_edges[i], self.max) if i < len(bucket_edges) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.sum / self.total * 1000 if self.total else None,
+            "p50_ms": self.percentile(50) * 1000 if self.total else None,
+            "p99_ms": self.percentile(99) * 1000 if self.total else None,
+            "max_ms": self.max * 1000,
+        }
+
+# Hot-path instrumentation for the ground station. Each stage of the main loop is timed
+# into its own histogram, failures are counted instead of printed, and the arrival time
+# of every fix is kept to work out the fix rate and how stale the newest fix on screen is.
+# Histograms cover one log interval: a snapshot of them and the counters is appended to
+# the metrics log as a JSON line, and they start over. Stages and counters are updated
+# from the serial reader's thread as well as the main loop, so updates and snapshots
+# take a lock.
+class Metrics:
+    def __init__(self, log_file="metrics.log", interval=log_interval):
+        self.log_file = log_file
+        self.interval = interval
+        self.stages = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+        self.arrivals = collections.deque(maxlen=64)
+        self.newest_fix = None
+        self.last_write = time.perf_counter()
+        self.lock = threading.Lock()
+
+    # Time a stage that began at start, a time.perf_counter() reading.
+    def record(self, stage, start):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.stages[stage].add(elapsed)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    # Set a counter kept elsewhere, such as the serial reader's dropped fixes.
+    def set(self, name, value):
+        with self.lock:
+            self.counters[name] = value
+
+    # Note a fix that arrived at arrival, a time.perf_counter() reading.
+    def fix(self, arrival):
+        with self.lock:
+            self.arrivals.append(arrival)
+            self.newest_fix = arrival
+            self.counters["fixes"] += 1
+
+    # Fixes per second over the recent arrivals.
+    def fix_rate(self):
+        if len(self.arrivals) < 2 or self.arrivals[-1] == self.arrivals[0]:
+            return 0.0
+        return (len(self.arrivals) - 1) / (self.arrivals[-1] - self.arrivals[0])
+
+    # Seconds since the newest fix arrived, or None if there hasn't been one.
+    def fix_age(self):
+        if self.newest_fix is None:
+            return None
+        return time.perf_counter() - self.newest_fix
+
+    # Text for the on-plot overlay.
+    def overlay(self):
+        age = self.fix_age()
+        with self.lock:
+            fix_rate = self.fix_rate()
+            counters = (self.counters["dropped"], self.counters["unparsed"], self.counters["not_locked"])
+        return "Fix rate: {0:.1f} Hz  Age: {1}\nDropped: {2}  Unparsed: {3}  Not locked: {4}".format(
+            fix_rate, "-" if age is None else "{0:.0f} ms".format(age * 1000), *counters)
+
+    # Append a snapshot to the metrics log if the interval is up (or force is set), and
+    # start the histograms over.
+    def maybe_write(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_write < self.interval:
+            return
+
+        # Swap in fresh histograms first, so a reader thread can keep recording meanwhile.
+        with self.lock:
+            stages, self.stages = self.stages, collections.defaultdict(Histogram)
+            counters = dict(self.counters)
+            fix_rate = self.fix_rate()
+            newest_fix = self.newest_fix
+        snapshot = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "interval_s": now - self.last_write,
+            "fix_rate_hz": fix_rate,
+            "fix_age_ms": None if newest_fix is None else (now - newest_fix) * 1000,
+            "counters": counters,
+            "stages": {stage: histogram.summary() for stage, histogram in stages.items()},
+        }
+        with open(self.log_file, "a") as log:
+            log.write(json.dumps(snapshot) + "\n")
+        self.last_write = now
+
+    def close(self):
+        self.maybe_write(force=True)
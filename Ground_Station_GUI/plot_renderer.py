@@ -0,0 +1,154 @@
+import time
+from matplotlib.patches import Ellipse
+from landing_predictor import footprint_bounds
+from track_decimator import TrackDecimator
+
+# Margin added around the track whenever the view has to grow, as a fraction of its span.
+view_margin = 0.25
+
+# Smallest half-width of the view in meters, so the first few fixes aren't magnified.
+min_half_width = 10.0
+
+# Helper function for filling the screen with a figure's window. Only Tk on Windows has
+# a "zoomed" state (X11 Tk has a -zoomed attribute instead), Qt windows are maximized
+# their own way, and other backends, headless ones included, are left as they are.
+def maximize(fig):
+    window = getattr(fig.canvas.manager, "window", None)
+    if hasattr(window, "state"):
+        import tkinter
+        try:
+            window.state("zoomed")
+        except tkinter.TclError:
+            window.attributes("-zoomed", True)
+    elif hasattr(window, "showMaximized"):
+        window.showMaximized()
+
+# Incremental renderer for a drift plot. The axes background (grid, labels, ticks) is
+# cached once and only the track line and distance/angle text are redrawn on top of it.
+# The axes are only rescaled when a point leaves the current view, and updates that
+# arrive faster than the frame rate cap are coalesced into a single frame. Long tracks
+# are drawn through a TrackDecimator, so only the recent points are drawn in full. A
+# predicted landing footprint, if there is one, is drawn as an ellipse with the track.
+class DriftRenderer:
+    def __init__(self, ax, line, props, fps=30):
+        self.ax = ax
+        self.fig = ax.figure
+        self.canvas = self.fig.canvas
+        self.line = line
+        self.text = ax.text(0.05, 0.05, "", fontsize=12, transform=ax.transAxes, bbox=props)
+        self.frame_interval = 1 / fps
+        self.last_frame = 0
+        self.background = None
+        self.track = None
+        self.text_str = ""
+        self.pending = False
+        self.rescale = False
+        self.decimator = TrackDecimator()
+        self.footprint = None
+        self.ellipse = Ellipse((0, 0), 0, 0, fill=False, color="tab:red", linestyle="--", visible=False)
+        ax.add_patch(self.ellipse)
+
+        # Animated artists are left out of a normal draw so they can be blitted on their own.
+        self.line.set_animated(True)
+        self.text.set_animated(True)
+        self.ellipse.set_animated(True)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+        # Zooming or panning by hand changes how far the track can be decimated.
+        ax.callbacks.connect("xlim_changed", self.on_view_change)
+        ax.callbacks.connect("ylim_changed", self.on_view_change)
+
+    # Cache the static background after every full draw (startup, resize, rescale).
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.ellipse)
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.text)
+
+    # Decimate the track again for the new view before it is drawn. A rescale from
+    # render() is left to render() itself.
+    def on_view_change(self, ax):
+        if self.track is not None and not self.rescale:
+            self.line.set_data(*self.decimator.points(self.track, self.ax))
+
+    # Put every point of the track back on the line, e.g. before saving the figure.
+    def full_resolution(self):
+        if self.track is not None:
+            self.line.set_data(self.track.x, self.track.y)
+
+    # Bounds of everything that should be in view: the track and the landing footprint.
+    def bounds(self):
+        if self.footprint is None:
+            return self.track.bounds
+        x_min, x_max, y_min, y_max = self.track.bounds
+        ellipse_bounds = footprint_bounds(self.footprint)
+        return (min(x_min, ellipse_bounds[0]), max(x_max, ellipse_bounds[1]),
+                min(y_min, ellipse_bounds[2]), max(y_max, ellipse_bounds[3]))
+
+    # Hand the renderer the track (a TrackBuffer), the text to show and optionally a
+    # landing_predictor.Footprint. Checking them against the current view only needs
+    # their bounds, and the artists themselves are only touched when a frame is
+    # actually drawn.
+    def update(self, track, text_str, footprint=None):
+        self.track = track
+        self.text_str = text_str
+        self.footprint = footprint
+
+        # See if the track or footprint has left the view.
+        if track.bounds is not None:
+            x_min, x_max, y_min, y_max = self.bounds()
+            x_low, x_high = self.ax.get_xlim()
+            y_low, y_high = self.ax.get_ylim()
+            if x_min < x_low or x_max > x_high or y_min < y_low or y_max > y_high:
+                self.rescale = True
+
+        self.pending = True
+
+    # Fit the view around the track and footprint with some room to grow.
+    def fit_view(self):
+        x_min, x_max, y_min, y_max = self.bounds()
+        x_center, y_center = (x_min + x_max) / 2, (y_min + y_max) / 2
+        half_width = max((x_max - x_min) / 2, (y_max - y_min) / 2, min_half_width)
+        half_width *= 1 + view_margin
+        self.ax.set_xlim(x_center - half_width, x_center + half_width)
+        self.ax.set_ylim(y_center - half_width, y_center + half_width)
+
+    # Draw a frame if there is something new and the frame rate cap allows it. Pass
+    # force=True to draw any pending update regardless of the cap.
+    def render(self, force=False):
+        now = time.monotonic()
+        if not self.pending or (not force and now - self.last_frame < self.frame_interval):
+            return False
+
+        # Fit the view first, since the track is decimated to it.
+        full_draw = self.rescale or self.background is None
+        if self.rescale:
+            self.fit_view()
+            self.rescale = False
+
+        # Push the latest track and text into the artists.
+        self.line.set_data(*self.decimator.points(self.track, self.ax))
+        self.text.set_text(self.text_str)
+        if self.footprint is not None:
+            self.ellipse.set_center((self.footprint.x, self.footprint.y))
+            self.ellipse.set_width(self.footprint.width)
+            self.ellipse.set_height(self.footprint.height)
+            self.ellipse.set_angle(self.footprint.angle)
+        self.ellipse.set_visible(self.footprint is not None)
+
+        # A rescale changes the ticks and grid, so it needs a full draw and a new background.
+        if full_draw:
+            self.canvas.draw()
+
+        # Otherwise restore the cached background and blit only the animated artists.
+        else:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.ellipse)
+            self.ax.draw_artist(self.line)
+            self.ax.draw_artist(self.text)
+            self.canvas.blit(self.ax.bbox)
+
+        self.canvas.flush_events()
+        self.last_frame = now
+        self.pending = False
+        return True
@@ -0,0 +1,93 @@
+import math
+import numpy as np
+import utm
+
+# Ellipsoid and UTM constants, matching the ones the utm package uses so results agree.
+R = 6378137.0
+K0 = 0.9996
+E = 0.00669438
+E2 = E * E
+E3 = E2 * E
+E_P2 = E / (1 - E)
+M1 = (1 - E / 4 - 3 * E2 / 64 - 5 * E3 / 256)
+M2 = (3 * E / 8 + 3 * E2 / 32 + 45 * E3 / 1024)
+M3 = (15 * E2 / 256 + 45 * E3 / 1024)
+M4 = (35 * E3 / 3072)
+
+# Projects lat/lon onto a flat x/y plane in meters for a whole flight. The UTM zone is
+# picked from the first fix and every constant that only depends on the zone is worked
+# out once, so projecting a fix is just the series itself. With method="enu" points are
+# instead projected onto the local tangent plane (east/north) at the first fix, which is
+# cheaper and plenty accurate over the few miles a recovery covers. Both methods take
+# either floats or NumPy arrays.
+class Projector:
+    def __init__(self, lat, lon, method="utm"):
+        if method not in ("utm", "enu"):
+            raise ValueError("Unknown projection method " + method)
+        self.method = method
+        self.origin = (lat, lon)
+
+        # Fix the zone and its central meridian from the first fix.
+        self.zone_number = utm.latlon_to_zone_number(lat, lon)
+        self.zone_letter = utm.latitude_to_zone_letter(lat)
+        self.central_lon = math.radians((self.zone_number - 1) * 6 - 180 + 3)
+        self.false_northing = 0.0 if self.zone_letter >= "N" else 10000000.0
+
+        # Work out the tangent plane at the first fix for the ENU projection.
+        lat0, lon0 = math.radians(lat), math.radians(lon)
+        self.sin_lat0, self.cos_lat0 = math.sin(lat0), math.cos(lat0)
+        self.sin_lon0, self.cos_lon0 = math.sin(lon0), math.cos(lon0)
+        self.ecef0 = self.ecef(lat0, lon0, math)
+
+    # Geodetic (on the ellipsoid) to earth-centered earth-fixed coordinates.
+    def ecef(self, lat, lon, mathlib):
+        sin_lat = mathlib.sin(lat)
+        n = R / mathlib.sqrt(1 - E * sin_lat * sin_lat)
+        cos_lat = mathlib.cos(lat)
+        return n * cos_lat * mathlib.cos(lon), n * cos_lat * mathlib.sin(lon), n * (1 - E) * sin_lat
+
+    # Project a fix or arrays of fixes. Returns x (east) and y (north) in meters.
+    def project(self, lat, lon):
+        mathlib = np if isinstance(lat, np.ndarray) else math
+        if self.method == "enu":
+            return self.project_enu(math.pi / 180 * lat, math.pi / 180 * lon, mathlib)
+        return self.project_utm(math.pi / 180 * lat, math.pi / 180 * lon, mathlib)
+
+    def project_utm(self, lat, lon, mathlib):
+        lat_sin = mathlib.sin(lat)
+        lat_cos = mathlib.cos(lat)
+        lat_tan = lat_sin / lat_cos
+        lat_tan2 = lat_tan * lat_tan
+        lat_tan4 = lat_tan2 * lat_tan2
+
+        n = R / mathlib.sqrt(1 - E * lat_sin * lat_sin)
+        c = E_P2 * lat_cos * lat_cos
+
+        # The whole flight is inside one zone, so no wrap-around is needed here.
+        a = lat_cos * (lon - self.central_lon)
+        a2 = a * a
+        a3 = a2 * a
+        a4 = a3 * a
+
+        # sin(2x), sin(4x) and sin(6x) from sin(x) and cos(x) instead of three more sin() calls.
+        sin2 = 2 * lat_sin * lat_cos
+        cos2 = 1 - 2 * lat_sin * lat_sin
+        sin4 = 2 * sin2 * cos2
+        sin6 = sin4 * cos2 + (2 * cos2 * cos2 - 1) * sin2
+        m = R * (M1 * lat - M2 * sin2 + M3 * sin4 - M4 * sin6)
+
+        x = K0 * n * (a +
+                      a3 / 6 * (1 - lat_tan2 + c) +
+                      a4 * a / 120 * (5 - 18 * lat_tan2 + lat_tan4 + 72 * c - 58 * E_P2)) + 500000
+        y = K0 * (m + n * lat_tan * (a2 / 2 +
+                                     a4 / 24 * (5 - lat_tan2 + 9 * c + 4 * c * c) +
+                                     a4 * a2 / 720 * (61 - 58 * lat_tan2 + lat_tan4 + 600 * c - 330 * E_P2)))
+        return x, y + self.false_northing
+
+    def project_enu(self, lat, lon, mathlib):
+        x, y, z = self.ecef(lat, lon, mathlib)
+        dx, dy, dz = x - self.ecef0[0], y - self.ecef0[1], z - self.ecef0[2]
+        east = -self.sin_lon0 * dx + self.cos_lon0 * dy
+        north = (-self.sin_lat0 * self.cos_lon0 * dx - self.sin_lat0 * self.sin_lon0 * dy
+                 + self.cos_lat0 * dz)
+        return east, north
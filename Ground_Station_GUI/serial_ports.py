@@ -0,0 +1,119 @@
+import glob
+import os
+import sys
+import threading
+import time
+import serial
+import serial.tools.list_ports
+
+# File the last port used is remembered in, along with the hardware id of the device on
+# it, so a restart can skip discovery.
+last_port_file = os.path.join(os.path.expanduser("~"), ".ground_station_port")
+
+# Seconds to wait for all probes to finish. Ports that take longer are left out.
+probe_timeout = 0.5
+
+# Helper function for listing every device that could be a serial port, the slow way.
+def glob_serial_ports():
+    if sys.platform.startswith("win"):
+        return ["COM%s" % (i + 1) for i in range(256)]
+    elif sys.platform.startswith("linux") or sys.platform.startswith("cygwin"):
+        # This excludes your current terminal "/dev/tty".
+        return glob.glob("/dev/tty[A-Za-z]*")
+    elif sys.platform.startswith("darwin"):
+        return glob.glob("/dev/tty.*")
+    else:
+        raise EnvironmentError("Unsupported platform")
+
+# Helper function for listing ports the OS knows are real serial devices (sysfs on Linux,
+# the registry on Windows), with USB-serial adapters such as the ATU radio first.
+def list_serial_ports():
+    ports = serial.tools.list_ports.comports()
+    usb = [port.device for port in ports if port.vid is not None]
+    other = [port.device for port in ports if port.vid is None]
+    return usb + other
+
+# Helper function for the hardware id the OS reports for a port (USB VID:PID and serial
+# number for a USB-serial adapter), or "" if the port isn't in its list.
+def hardware_id(port_name):
+    for port in serial.tools.list_ports.comports():
+        if port.device == port_name:
+            return port.hwid or ""
+    return ""
+
+# Helper function for checking that a port can be opened.
+def probe(port):
+    try:
+        s = serial.Serial(port, timeout=0, write_timeout=0)
+        s.close()
+        return True
+    except (OSError, serial.SerialException):
+        return False
+
+# Helper function for probing ports all at once, returning the ones that could be opened
+# within probe_timeout. Probes run on daemon threads so a port that hangs can't hold up
+# startup or exit.
+def probe_ports(candidates):
+    results = {}
+    threads = []
+    for port in candidates:
+        thread = threading.Thread(target=lambda port=port: results.update({port: probe(port)}), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    deadline = time.monotonic() + probe_timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+
+    return [port for port in candidates if results.get(port)]
+
+# Helper function for discovering serial ports. Candidates come from the OS port list,
+# falling back to globbing device names if it is empty.
+def find_serial_ports():
+    candidates = list_serial_ports()
+    if len(candidates) == 0:
+        candidates = glob_serial_ports()
+    return probe_ports(candidates)
+
+# Helper function for reading the last port used and the hardware id of the device that
+# was on it, or (None, None) if there isn't one.
+def load_last_port():
+    try:
+        with open(last_port_file, "r") as port_file:
+            port_name, _, hwid = port_file.read().strip().partition("\n")
+    except OSError:
+        return None, None
+    return port_name or None, hwid
+
+# Helper function for remembering the port chosen and the device on it for next time.
+def save_last_port(port_name):
+    try:
+        with open(last_port_file, "w") as port_file:
+            port_file.write(port_name + "\n" + hardware_id(port_name))
+    except OSError:
+        pass
+
+# Helper function for picking the port to listen on. The last port used is taken
+# straight away if the same device is still on it and it opens within probe_timeout,
+# otherwise ports are discovered and the user is asked to choose if there is more than one.
+def choose_serial_port():
+    port_name, hwid = load_last_port()
+    if port_name is not None and hardware_id(port_name) == hwid and probe_ports([port_name]):
+        print("Using last serial port: ", port_name)
+        return port_name
+
+    # Detername name of serial port.
+    ports = find_serial_ports()
+    if len(ports) == 0:
+        raise Exception("No serial ports found")
+    elif len(ports) > 1:
+        print("Multiple serial ports found: ", ports)
+        port_name = input("Enter the port you would like to use: ")
+        while port_name not in ports:
+            print("Error: not a port name")
+            port_name = input("Enter the port you would like to use: ")
+    else:
+        port_name = ports[0]
+
+    save_last_port(port_name)
+    return port_name
@@ -0,0 +1,62 @@
+import collections
+import threading
+import time
+from framer import RecordFramer
+
+# Background reader that drains the serial port on its own thread so a slow plot
+# redraw never backs up the UART. Parsed fixes are kept in a bounded ring buffer along
+# with the time they arrived; when the GUI falls behind the oldest fixes are dropped and
+# counted. Given a Metrics object, the time spent waiting on the port is recorded.
+class SerialReader(threading.Thread):
+    def __init__(self, ser, parse, depth=256, metrics=None):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.parse = parse
+        self.metrics = metrics
+        self.framer = RecordFramer()
+        self.fixes = collections.deque(maxlen=depth)
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.running = True
+
+    # Number of parsed fixes waiting to be consumed.
+    @property
+    def queue_depth(self):
+        return len(self.fixes)
+
+    # Number of times the framer had to throw bytes away to find the next record.
+    @property
+    def framing_errors(self):
+        return self.framer.framing_errors
+
+    def run(self):
+        while self.running:
+            # Read everything waiting on the port and parse each complete record,
+            # skipping any that don't parse into a fix.
+            start = time.perf_counter()
+            records = self.framer.read(self.ser)
+            arrival = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.record("serial", start)
+
+            for record in records:
+                fix = self.parse(record)
+                if fix is None:
+                    continue
+
+                # Add the fix to the ring buffer, counting the one it pushes out if full.
+                with self.lock:
+                    if len(self.fixes) == self.fixes.maxlen:
+                        self.dropped += 1
+                    self.fixes.append((arrival, fix))
+
+    # Remove and return every (arrival time, fix) pair that has arrived since the last call.
+    # Arrival times are time.perf_counter() readings.
+    def drain(self):
+        with self.lock:
+            fixes = list(self.fixes)
+            self.fixes.clear()
+        return fixes
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Growable track of x/y points backed by preallocated float64 arrays. The arrays
+# double in size when they fill up, so appending is O(1) on average, and the x and y
+# properties are views into them rather than copies. The bounds of every point ever
+# added are kept as points come in so axis limits never need a pass over the track.
+class TrackBuffer:
+    def __init__(self, capacity=4096):
+        self._x = np.empty(capacity)
+        self._y = np.empty(capacity)
+        self.count = 0
+        self.bounds = None
+
+    def __len__(self):
+        return self.count
+
+    # Views of the points added so far.
+    @property
+    def x(self):
+        return self._x[:self.count]
+
+    @property
+    def y(self):
+        return self._y[:self.count]
+
+    # Make room for at least size points, doubling the arrays as many times as needed.
+    def reserve(self, size):
+        capacity = len(self._x)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        x = np.empty(capacity)
+        y = np.empty(capacity)
+        x[:self.count] = self._x[:self.count]
+        y[:self.count] = self._y[:self.count]
+        self._x, self._y = x, y
+
+    def append(self, x, y):
+        if self.count == len(self._x):
+            self.reserve(self.count + 1)
+        self._x[self.count] = x
+        self._y[self.count] = y
+        self.count += 1
+
+        # Grow the bounds to include the new point.
+        if self.bounds is None:
+            self.bounds = (x, x, y, y)
+        else:
+            x_min, x_max, y_min, y_max = self.bounds
+            self.bounds = (min(x_min, x), max(x_max, x), min(y_min, y), max(y_max, y))
+
+    # Append whole arrays of points at once.
+    def extend(self, xs, ys):
+        if len(xs) == 0:
+            return
+        self.reserve(self.count + len(xs))
+        self._x[self.count:self.count + len(xs)] = xs
+        self._y[self.count:self.count + len(ys)] = ys
+        self.count += len(xs)
+
+        # Grow the bounds to include the new points.
+        bounds = (np.min(xs), np.max(xs), np.min(ys), np.max(ys))
+        if self.bounds is not None:
+            x_min, x_max, y_min, y_max = self.bounds
+            bounds = (min(x_min, bounds[0]), max(x_max, bounds[1]),
+                      min(y_min, bounds[2]), max(y_max, bounds[3]))
+        self.bounds = tuple(float(b) for b in bounds)
+
+    # The most recently added point.
+    def last(self):
+        return self._x[self.count - 1], self._y[self.count - 1]
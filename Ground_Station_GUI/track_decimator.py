@@ -0,0 +1,64 @@
+import numpy as np
+from track_buffer import TrackBuffer
+
+# Number of most recent points that are always drawn at full resolution.
+recent_points = 1000
+
+# Helper function for thinning a run of points to one per screen pixel. A point is kept
+# when it lands in a different pixel from the point before it, so the line drawn through
+# the kept points never strays more than a pixel from the full track. Returns the kept
+# points and the pixel the last point fell in, to carry on from with the next run.
+def decimate(x, y, origin, pixel_size, last_cell=None):
+    ix = np.floor((x - origin[0]) / pixel_size[0])
+    iy = np.floor((y - origin[1]) / pixel_size[1])
+    keep = np.empty(len(x), dtype=bool)
+    keep[0] = last_cell is None or (ix[0], iy[0]) != last_cell
+    keep[1:] = (ix[1:] != ix[:-1]) | (iy[1:] != iy[:-1])
+    return x[keep], y[keep], (ix[-1], iy[-1])
+
+# Level-of-detail view of a TrackBuffer for drawing. The older part of the track is
+# decimated to the pixel grid of the axes it is drawn on and the most recent points are
+# passed through untouched. The decimated history is only rebuilt from scratch when the
+# view (limits or size on screen) changes; otherwise points that age out of the recent
+# window are decimated and appended to it, so each frame costs the same however long
+# the flight has been.
+class TrackDecimator:
+    def __init__(self, recent=recent_points):
+        self.recent = recent
+        self.view = None
+        self.history = TrackBuffer()
+        self.history_end = 0
+        self.last_cell = None
+
+    # Key that changes whenever the data to pixel mapping does.
+    @staticmethod
+    def view_key(ax):
+        return ax.get_xlim() + ax.get_ylim() + (ax.bbox.width, ax.bbox.height)
+
+    # Return x and y arrays to draw track with on ax.
+    def points(self, track, ax):
+        # Short tracks are cheap enough to draw in full.
+        if len(track) <= 2 * self.recent:
+            return track.x, track.y
+
+        # Start the history over if the view has changed (or the track was swapped).
+        view = self.view_key(ax)
+        if view != self.view or self.history_end > len(track):
+            self.view = view
+            self.history = TrackBuffer()
+            self.history_end = 0
+            self.last_cell = None
+
+        # Decimate everything that has aged out of the recent window, once the window
+        # has filled up twice over so this happens in batches rather than every frame.
+        split = len(track) - self.recent
+        if split - self.history_end >= self.recent or self.history_end == 0:
+            x_low, x_high, y_low, y_high = view[:4]
+            pixel_size = ((x_high - x_low) / max(view[4], 1), (y_high - y_low) / max(view[5], 1))
+            x, y, self.last_cell = decimate(track.x[self.history_end:split], track.y[self.history_end:split],
+                                            (x_low, y_low), pixel_size, self.last_cell)
+            self.history.extend(x, y)
+            self.history_end = split
+
+        return (np.concatenate((self.history.x, track.x[self.history_end:])),
+                np.concatenate((self.history.y, track.y[self.history_end:])))
@@ -0,0 +1,89 @@
+import math
+from matplotlib.gridspec import GridSpec
+from plot_renderer import DriftRenderer
+from track_buffer import TrackBuffer
+
+# Track state for a single ATU: its origin, every point relative to that origin in a
+# preallocated track buffer, the last fix it sent, and the axes and renderer it is drawn on.
+class TrackState:
+    def __init__(self, name, ax, props):
+        self.name = name
+        self.origin = None
+        self.last_fix = None
+        self.text = ""
+
+        # The track starts at the origin (0,0).
+        self.track = TrackBuffer()
+        self.track.append(0, 0)
+
+        # Set labels and create grid.
+        self.ax = ax
+        ax.set_title("Launch Vehicle Drift ({0})".format(name.capitalize()))
+        ax.set_xlabel("East (m)")
+        ax.set_ylabel("North (m)")
+        ax.grid(color="k", linestyle="-", linewidth=0.5)
+        ax.set_aspect("equal", adjustable="box")
+        line, = ax.plot(self.track.x, self.track.y)
+        self.renderer = DriftRenderer(ax, line, props)
+
+    # Add a fix at UTM coordinates x, y. The first fix becomes the origin.
+    def add_fix(self, fix, x, y):
+        self.last_fix = fix
+        if self.origin is None:
+            self.origin = (x, y)
+            return
+
+        # All other points are relative to the origin.
+        x = x - self.origin[0]
+        y = y - self.origin[1]
+
+        # Add new data point.
+        self.track.append(x, y)
+
+        # Compute and print absolute distance and angle from origin.
+        dist  = math.sqrt(x**2 + y**2)
+        angle = math.degrees(math.atan2(y, x))
+        self.text = "Distance: {0:.2f} m\nAngle: {1:.2f}$^\\circ$".format(dist, angle)
+        self.renderer.update(self.track, self.text)
+
+# Tracks any number of ATUs, keyed by name. Each unit gets its own subplot, and the
+# grid of subplots is laid out again whenever a new unit shows up.
+class ATUTracker:
+    def __init__(self, fig, props):
+        self.fig = fig
+        self.props = props
+        self.units = {}
+
+    # Return the track for an ATU, creating it and its subplot the first time it is seen.
+    def track(self, name):
+        unit = self.units.get(name)
+        if unit is None:
+            unit = self.add_unit(name)
+        return unit
+
+    # Lay the subplots out as close to a square grid as possible with room for a new unit.
+    def add_unit(self, name):
+        num_units = len(self.units) + 1
+        cols = math.ceil(math.sqrt(num_units))
+        rows = math.ceil(num_units / cols)
+        grid = GridSpec(rows, cols, figure=self.fig)
+        for i, unit in enumerate(self.units.values()):
+            unit.ax.set_subplotspec(grid[i])
+
+        unit = TrackState(name, self.fig.add_subplot(grid[num_units - 1]), self.props)
+        self.units[name] = unit
+
+        # Force a full draw so every renderer caches its new background.
+        self.fig.canvas.draw()
+        return unit
+
+    def add_fix(self, name, fix, x, y):
+        self.track(name).add_fix(fix, x, y)
+
+    # Draw any units with new points, subject to each renderer's frame rate cap unless
+    # force is set. Any overlay text is shown under every unit's distance and angle.
+    def render(self, overlay=None, force=False):
+        for unit in self.units.values():
+            if overlay is not None and len(unit.track) > 1:
+                unit.renderer.update(unit.track, unit.text + "\n" + overlay)
+            unit.renderer.render(force)